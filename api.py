@@ -1,10 +1,65 @@
-from fastapi import FastAPI, Request
-from fastapi.responses import StreamingResponse, HTMLResponse, JSONResponse
-from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
-from generate_service import generate_official_rules
+import asyncio
+from contextlib import asynccontextmanager
+from typing import Literal
 
-app = FastAPI(docs_url=None, redoc_url=None, openapi_url=None)
+from fastapi import Body, FastAPI, Request
+from fastapi.responses import StreamingResponse, HTMLResponse, JSONResponse, PlainTextResponse, Response
+from fastapi.middleware.cors import CORSMiddleware
+from pydantic import BaseModel, ValidationError
+from generate_service import (
+    SECTIONS,
+    compliance_report,
+    warm_up_async,
+    stream_official_rules_async,
+    generate_official_rules_batch_async,
+    generate_official_rules_bundle_async,
+    create_draft_async,
+    revise_draft_async,
+    build_draft_docx,
+)
+from generation.generate import GenerationError, close_async_client
+from metrics import render_prometheus
+from jobs import JOB_WORKERS, JobWorkerPool, get_job_store
+from drafts import DraftConflict, get_draft_store, merge_patch
+
+job_pool: JobWorkerPool | None = None
+
+# Flipped by the warm-up task; reported by /ready
+warmup_state: dict = {"ready": False, "error": None, "timings": {}}
+
+
+async def _warm_up() -> None:
+    try:
+        timings = await warm_up_async()
+    except Exception as e:
+        # Requests still work (everything loads lazily); /ready stays 503
+        warmup_state["error"] = f"{type(e).__name__}: {e}"
+        print(f"⚠️ Warm-up failed: {warmup_state['error']}")
+        return
+    warmup_state.update(ready=True, timings=timings)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Warm up in the background so the port binds immediately
+    warmup = asyncio.create_task(_warm_up())
+
+    # Background generation workers (JOB_WORKERS=0 -> run `python jobs.py` separately)
+    global job_pool
+    if JOB_WORKERS > 0:
+        job_pool = JobWorkerPool(get_job_store(), JOB_WORKERS)
+        job_pool.start()
+    try:
+        yield
+    finally:
+        warmup.cancel()
+        if job_pool is not None:
+            await job_pool.stop()
+            job_pool = None
+        await close_async_client()
+
+
+app = FastAPI(docs_url=None, redoc_url=None, openapi_url=None, lifespan=lifespan)
 
 from fastapi import Depends, HTTPException, status
 import secrets
@@ -26,6 +81,14 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.exception_handler(GenerationError)
+async def generation_error_handler(request: Request, exc: GenerationError):
+    # Model failures surface as an HTTP error, never as text inside the .docx
+    return JSONResponse(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE if exc.rate_limited else status.HTTP_502_BAD_GATEWAY,
+        content={"detail": str(exc)},
+    )
+
 # -----------------------------
 # MODELS
 # -----------------------------
@@ -82,19 +145,257 @@ def login(body: LoginRequest):
 # -----------------------------
 
 @app.post("/generate")
-def generate_rules(
+async def generate_rules(
     request: SweepstakesRequest,
+    include_report: bool = False,
     _auth: None = Depends(verify)
 ):
-    buffer = generate_official_rules(request.dict())
+    if include_report:
+        # .docx + compliance report (text and JSON) in one zip
+        bundle = await generate_official_rules_bundle_async(request.dict())
+        return StreamingResponse(
+            bundle,
+            media_type="application/zip",
+            headers={"Content-Disposition": "attachment; filename=official_rules_bundle.zip"}
+        )
+
+    stream = stream_official_rules_async(request.dict())
+    try:
+        # Validation, constraints and retrieval run before the first chunk:
+        # failures up to here still get their own status code
+        first = await anext(stream)
+    except BaseException:
+        await stream.aclose()
+        raise
+
+    async def body():
+        try:
+            yield first
+            async for chunk in stream:
+                yield chunk
+        except GenerationError as e:
+            # The 200 is already out; raising aborts the chunked body, so the
+            # client sees a broken transfer instead of a complete-looking .docx
+            print(f"⚠️ Generation failed mid-stream: {e}")
+            raise
+        finally:
+            # Stops the remaining section tasks/LLM calls right away on failure
+            # or disconnect, instead of whenever the generator is collected
+            await stream.aclose()
 
     return StreamingResponse(
-        buffer,
+        body(),
+        media_type="application/vnd.openxmlformats-officedocument.wordprocessingml.document",
+        headers={"Content-Disposition": "attachment; filename=official_rules.docx"}
+    )
+
+
+# -----------------------------
+# COMPLIANCE REPORT ENDPOINT
+# -----------------------------
+
+@app.post("/compliance-report")
+async def get_compliance_report(
+    request: SweepstakesRequest,
+    format: Literal["text", "json"] = "text",
+    _auth: None = Depends(verify)
+):
+    # Constraint evaluation only: no model calls, no files written
+    try:
+        text, report = await asyncio.to_thread(compliance_report, request.dict())
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=str(e))
+
+    if format == "json":
+        return report
+    return PlainTextResponse(text)
+
+
+# -----------------------------
+# BATCH GENERATE ENDPOINT
+# -----------------------------
+
+BATCH_MAX_ITEMS = 100
+
+@app.post("/generate/batch")
+async def generate_rules_batch(
+    requests: list[SweepstakesRequest],
+    _auth: None = Depends(verify)
+):
+    if not requests:
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail="At least one request is required")
+    if len(requests) > BATCH_MAX_ITEMS:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"Batch is limited to {BATCH_MAX_ITEMS} requests"
+        )
+
+    archive = await generate_official_rules_batch_async([r.dict() for r in requests])
+
+    return StreamingResponse(
+        archive,
+        media_type="application/zip",
+        headers={"Content-Disposition": "attachment; filename=official_rules_batch.zip"}
+    )
+
+
+# -----------------------------
+# BACKGROUND JOB ENDPOINTS
+# -----------------------------
+
+@app.post("/jobs", status_code=status.HTTP_202_ACCEPTED)
+async def create_job(
+    request: SweepstakesRequest,
+    _auth: None = Depends(verify)
+):
+    job_id = await asyncio.to_thread(get_job_store().create, request.dict())
+    if job_pool is not None:
+        job_pool.notify()
+
+    return JSONResponse(
+        status_code=status.HTTP_202_ACCEPTED,
+        content={"id": job_id, "status": "queued"},
+        headers={"Location": f"/jobs/{job_id}"}
+    )
+
+
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str, _auth: None = Depends(verify)):
+    job = await asyncio.to_thread(get_job_store().get, job_id)
+    if job is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Job not found")
+
+    job["sections_total"] = len(SECTIONS)
+    return job
+
+
+@app.get("/jobs/{job_id}/result")
+async def get_job_result(job_id: str, _auth: None = Depends(verify)):
+    store = get_job_store()
+    result = await asyncio.to_thread(store.result, job_id)
+    if result is None:
+        job = await asyncio.to_thread(store.get, job_id)
+        if job is None:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Job not found")
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=f"Job is {job['status']}" + (f": {job['error']}" if job["error"] else "")
+        )
+
+    return Response(
+        content=result,
         media_type="application/vnd.openxmlformats-officedocument.wordprocessingml.document",
         headers={"Content-Disposition": "attachment; filename=official_rules.docx"}
     )
 
 
+# -----------------------------
+# DRAFT ENDPOINTS
+# -----------------------------
+
+DOCX_MEDIA_TYPE = "application/vnd.openxmlformats-officedocument.wordprocessingml.document"
+
+
+def _draft_response(content: bytes, draft, regenerated: list[str]) -> Response:
+    return Response(
+        content=content,
+        media_type=DOCX_MEDIA_TYPE,
+        headers={
+            "Content-Disposition": "attachment; filename=official_rules.docx",
+            "Location": f"/drafts/{draft.id}",
+            "X-Draft-Id": draft.id,
+            "X-Draft-Version": str(draft.version),
+            "X-Regenerated-Sections": ",".join(regenerated),
+        }
+    )
+
+
+async def _get_draft(draft_id: str):
+    draft = await asyncio.to_thread(get_draft_store().get, draft_id)
+    if draft is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Draft not found")
+    return draft
+
+
+@app.post("/drafts", status_code=status.HTTP_201_CREATED)
+async def create_draft(
+    request: SweepstakesRequest,
+    _auth: None = Depends(verify)
+):
+    try:
+        draft, buffer = await create_draft_async(request.dict())
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=str(e))
+
+    response = _draft_response(buffer.getvalue(), draft, [section["id"] for section in SECTIONS])
+    response.status_code = status.HTTP_201_CREATED
+    return response
+
+
+@app.get("/drafts/{draft_id}")
+async def get_draft(draft_id: str, _auth: None = Depends(verify)):
+    draft = await _get_draft(draft_id)
+    return {
+        "id": draft.id,
+        "version": draft.version,
+        "form": draft.form,
+        "sections": list(draft.sections),
+        "created_at": draft.created,
+        "updated_at": draft.updated,
+    }
+
+
+@app.get("/drafts/{draft_id}/document")
+async def get_draft_document(draft_id: str, _auth: None = Depends(verify)):
+    draft = await _get_draft(draft_id)
+    buffer = await asyncio.to_thread(build_draft_docx, draft)
+    return _draft_response(buffer.getvalue(), draft, [])
+
+
+@app.patch("/drafts/{draft_id}")
+async def patch_draft(
+    draft_id: str,
+    patch: dict = Body(...),
+    _auth: None = Depends(verify)
+):
+    # Field-level JSON merge patch, e.g. {"prizes": [...]} or {"entry_method": {"url": "..."}}
+    draft = await _get_draft(draft_id)
+    try:
+        form_data = SweepstakesRequest(**merge_patch(draft.form, patch)).dict()
+        draft, regenerated, buffer = await revise_draft_async(draft, form_data)
+    except ValidationError as e:
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=e.errors(include_url=False))
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=str(e))
+    except DraftConflict as e:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
+
+    return _draft_response(buffer.getvalue(), draft, regenerated)
+
+
+# -----------------------------
+# READINESS PROBE
+# -----------------------------
+
+@app.get("/ready")
+def ready():
+    if warmup_state["ready"]:
+        return {"status": "ready", "warmup_seconds": warmup_state["timings"]}
+    return JSONResponse(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        content={"status": "failed" if warmup_state["error"] else "warming_up", "error": warmup_state["error"]},
+    )
+
+
+# -----------------------------
+# METRICS ENDPOINT
+# -----------------------------
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics():
+    return PlainTextResponse(render_prometheus(), media_type="text/plain; version=0.0.4")
+
+
 # -----------------------------
 # FRONTEND UI
 # -----------------------------
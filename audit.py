@@ -0,0 +1,258 @@
+"""
+Bulk compliance audit: hard-constraint classification for a whole
+promotion portfolio, no model calls.
+
+    python audit.py portfolio.jsonl > audit.jsonl
+    python audit.py portfolio.csv -o audit.jsonl --summary summary.json --workers 8
+
+Input is JSONL (one /generate request body per line) or CSV with the same
+field names. In CSV, `states` and `entry_fields` are ";"-separated, and
+`prizes` is either a JSON array or "cash:5000;giftcard:$50 card".
+
+Output is one JSON line per promotion, in input order, with its input
+row number, its rule ids per bucket and any warnings. A row that can't be
+evaluated gets an error line instead; it never stops the run. The
+aggregate summary (how often each rule lands in each bucket) goes to
+stderr and, optionally, to --summary.
+"""
+import os
+import sys
+import csv
+import json
+import time
+import argparse
+from collections import Counter
+from multiprocessing import Pool
+
+from document import create_document
+from constraint_engine import get_compiled_constraints
+
+HARD_CONSTRAINTS_PATH = "hard_constraints.json"
+AUDIT_CHUNK_SIZE = int(os.getenv("AUDIT_CHUNK_SIZE", "500"))
+
+BUCKETS = ("foundational", "triggered", "conditional", "evaluated_not_triggered")
+
+_INT_FIELDS = ("door_count", "min_age")
+
+
+# -------------------------------------------------------------------
+# Input parsing
+# -------------------------------------------------------------------
+def _split(value: str | None) -> list[str]:
+    return [v.strip() for v in (value or "").split(";") if v.strip()]
+
+
+def _parse_prizes(value: str | None) -> list[dict]:
+    value = (value or "").strip()
+    if value.startswith("["):
+        return json.loads(value)
+
+    prizes = []
+    for item in _split(value):
+        prize_type, _, detail = item.partition(":")
+        prize_type = prize_type.strip().lower()
+        if prize_type == "cash":
+            prizes.append({"type": "cash", "amount": float(detail.replace("$", "").replace(",", ""))})
+        else:
+            prizes.append({"type": prize_type, "description": detail.strip()})
+    return prizes
+
+
+def _from_csv_row(row: dict) -> dict:
+    """
+    Flat CSV row -> the nested shape create_document(from_api_data=...) expects.
+    """
+    data = {k: v for k, v in row.items() if k and v not in (None, "")}
+    for field in _INT_FIELDS:
+        if field in data:
+            data[field] = int(data[field])
+    data["states"] = _split(data.get("states"))
+    data["prizes"] = _parse_prizes(data.get("prizes"))
+
+    if "entry_method" in data:
+        data["entry_method"] = json.loads(data["entry_method"])
+    else:
+        data["entry_method"] = {
+            "channel": data.pop("entry_channel", None),
+            "url": data.pop("entry_url", None),
+            "required_fields": _split(data.pop("entry_fields", None)),
+        }
+    return data
+
+
+def read_promotions(path: str, fmt: str | None = None):
+    """
+    Yields (row number, kind, raw) items: JSONL lines are passed through
+    unparsed so the workers do the decoding. Rows are numbered from 1
+    (CSV: data rows after the header; JSONL: lines, blank ones included).
+    """
+    if fmt is None:
+        fmt = "csv" if path.lower().endswith(".csv") else "jsonl"
+
+    f = sys.stdin if path == "-" else open(path, newline="" if fmt == "csv" else None, encoding="utf-8")
+    try:
+        if fmt == "csv":
+            for row_number, row in enumerate(csv.DictReader(f), start=1):
+                yield (row_number, "csv", row)
+        else:
+            for row_number, line in enumerate(f, start=1):
+                if line.strip():
+                    yield (row_number, "json", line)
+    finally:
+        if f is not sys.stdin:
+            f.close()
+
+
+# -------------------------------------------------------------------
+# Worker side
+# -------------------------------------------------------------------
+def audit_promotion(item: tuple[int, str, object]) -> tuple[str, dict | None, int]:
+    """
+    Evaluate one promotion. Returns (output JSON line, {bucket: [rule ids]}
+    or None on error, warning count).
+    """
+    row, kind, raw = item
+    name = None
+    try:
+        data = json.loads(raw) if kind == "json" else _from_csv_row(raw)
+        if not isinstance(data, dict) or not data:
+            # An empty dict would drop create_document into interactive mode
+            raise ValueError("Empty promotion")
+        name = data.get("name")
+
+        doc = create_document(from_api_data=data)
+        doc.validate()
+        doc.load_hard_constraints(HARD_CONSTRAINTS_PATH)
+        doc.apply_hard_constraints()
+    except Exception as e:
+        # Any malformed row (e.g. "entry_method": null) is reported, not fatal:
+        # an exception escaping a pool worker would abort the whole audit
+        if isinstance(e, KeyError):
+            message = f"missing field {e}"
+        elif isinstance(e, ValueError):
+            message = str(e)
+        else:
+            message = f"{type(e).__name__}: {e}"
+        return json.dumps({"row": row, "name": name, "status": "error", "error": message}), None, 0
+
+    output = doc._constraint_output
+    buckets = {bucket: [r["id"] for r in output[bucket]] for bucket in BUCKETS}
+    record = {
+        "row": row,
+        "name": name,
+        "status": "ok",
+        **buckets,
+        # Threshold reasons differ per promotion; everything else is in the summary
+        "triggered_reasons": {r["id"]: r["reason"] for r in output["triggered"]},
+        "warnings": doc._constraint_warnings,
+    }
+    return json.dumps(record), buckets, len(doc._constraint_warnings)
+
+
+def _rule_catalog() -> dict[str, dict]:
+    constraints = get_compiled_constraints(HARD_CONSTRAINTS_PATH).source
+    return {c.get("id"): {"rule": c["rule"], "category": c.get("category")} for c in constraints}
+
+
+# -------------------------------------------------------------------
+# Aggregation
+# -------------------------------------------------------------------
+class AuditSummary:
+    def __init__(self):
+        self.total = 0
+        self.errors = 0
+        self.warnings = 0
+        self.counts: dict[str, Counter] = {bucket: Counter() for bucket in BUCKETS}
+
+    def add(self, buckets: dict | None, warnings: int) -> None:
+        self.total += 1
+        if buckets is None:
+            self.errors += 1
+            return
+        self.warnings += warnings
+        for bucket, ids in buckets.items():
+            self.counts[bucket].update(ids)
+
+    def to_dict(self, catalog: dict[str, dict], elapsed: float) -> dict:
+        rules = {
+            rule_id: {**info, **{bucket: self.counts[bucket][rule_id] for bucket in BUCKETS}}
+            for rule_id, info in catalog.items()
+        }
+        return {
+            "promotions": self.total,
+            "ok": self.total - self.errors,
+            "errors": self.errors,
+            "warnings": self.warnings,
+            "elapsed_seconds": round(elapsed, 3),
+            "rules": rules,
+        }
+
+
+def print_summary(summary: dict, out=sys.stderr) -> None:
+    print(
+        f"\nAudited {summary['promotions']} promotions in {summary['elapsed_seconds']}s "
+        f"({summary['ok']} ok, {summary['errors']} errors, {summary['warnings']} warnings)\n",
+        file=out,
+    )
+    print(f"{'RULE':<40} {'TRIGGERED':>10} {'NOT MET':>10} {'COND.':>10}", file=out)
+    print("-" * 73, file=out)
+    ranked = sorted(summary["rules"].items(), key=lambda kv: (-kv[1]["triggered"], kv[0] or ""))
+    for rule_id, r in ranked:
+        if r["foundational"]:
+            continue
+        print(f"{(rule_id or '-'):<40} {r['triggered']:>10} {r['evaluated_not_triggered']:>10} {r['conditional']:>10}", file=out)
+
+
+def run_audit(path: str, out, fmt: str | None = None, workers: int | None = None, chunk_size: int = AUDIT_CHUNK_SIZE) -> dict:
+    started = time.perf_counter()
+    summary = AuditSummary()
+    items = read_promotions(path, fmt)
+
+    if workers == 1:
+        results = map(audit_promotion, items)
+        pool = None
+    else:
+        pool = Pool(processes=workers)
+        # imap keeps input order; each chunk is written out as soon as it is back
+        results = pool.imap(audit_promotion, items, chunksize=chunk_size)
+
+    try:
+        for line, buckets, warnings in results:
+            out.write(line)
+            out.write("\n")
+            summary.add(buckets, warnings)
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+
+    return summary.to_dict(_rule_catalog(), time.perf_counter() - started)
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Hard-constraint audit for a promotion portfolio (no LLM calls).")
+    parser.add_argument("input", help="JSONL or CSV file ('-' for stdin)")
+    parser.add_argument("--format", choices=("jsonl", "csv"), help="default: from the file extension")
+    parser.add_argument("-o", "--output", help="per-promotion JSONL (default: stdout)")
+    parser.add_argument("--summary", help="also write the aggregate summary as JSON")
+    parser.add_argument("--workers", type=int, default=None, help="process count (default: CPU count, 1 = in-process)")
+    parser.add_argument("--chunk-size", type=int, default=AUDIT_CHUNK_SIZE)
+    args = parser.parse_args(argv)
+
+    out = open(args.output, "w", encoding="utf-8") if args.output else sys.stdout
+    try:
+        summary = run_audit(args.input, out, args.format, args.workers, args.chunk_size)
+    finally:
+        if out is not sys.stdout:
+            out.close()
+
+    if args.summary:
+        with open(args.summary, "w", encoding="utf-8") as f:
+            json.dump(summary, f, indent=2)
+
+    print_summary(summary)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,304 @@
+"""
+Microbenchmarks for the deterministic (non-LLM) parts of a request.
+
+    python -m benchmarks.bench_hot_paths                   # full suite
+    python -m benchmarks.bench_hot_paths --quick           # skip the largest inputs
+    python -m benchmarks.bench_hot_paths --compare benchmarks/results/<sha>.json
+
+Results are written as JSON (default: benchmarks/results/<git sha>.json) so
+runs can be diffed across commits. --compare exits non-zero when any shared
+benchmark got slower than --max-regression.
+"""
+import sys
+import json
+import time
+import random
+import platform
+import argparse
+import tempfile
+import statistics
+import subprocess
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from document import create_document                                   # noqa: E402
+from constraint_engine import compile_constraints                     # noqa: E402
+from knowledge import retrieval                                        # noqa: E402
+from generation.payload_builder import build_generation_payload        # noqa: E402
+from generate_service import SECTIONS, _build_docx, _build_promotion_context  # noqa: E402
+
+
+# -------------------------------------------------------------------
+# Synthetic inputs
+# -------------------------------------------------------------------
+WORDS = (
+    "sponsor sweepstakes entry enter eligible residents age void prize winner odds "
+    "value arv notification affidavit release tax bond registration florida new york "
+    "general conditions limitation liability official rules agreement no purchase "
+    "necessary mail-in employees verification w-9 1099 cancel disclaimer"
+).split()
+
+KB_SECTIONS = [
+    "Intro", "Eligibility", "How to Enter", "Prize", "Prize(s)", "Winner Notification",
+    "Privacy", "Release", "General Conditions", "Arbitration", "Disputes", None,
+]
+
+STATES = ["NY", "FL", "RI", "CA", "TX", "NE", "VA", "MA", "NJ", "IL", "WA", "GA"]
+
+
+def synthetic_kb(n_chunks: int, rng: random.Random) -> list[dict]:
+    kb = []
+    for i in range(n_chunks):
+        section = rng.choice(KB_SECTIONS)
+        kb.append({
+            "id": f"synthetic_{i}",
+            "doc_type": "official_rules" if section else "abbreviated_disclosure",
+            "section": section,
+            "channel": None if section else "web",
+            "hard_constraint": rng.random() < 0.3,
+            "text": " ".join(rng.choice(WORDS) for _ in range(rng.randint(20, 120))),
+            "tags": [],
+        })
+    return kb
+
+
+def synthetic_constraints(n_rules: int, rng: random.Random) -> list[dict]:
+    categories = [s["category"] for s in SECTIONS]
+    rules = []
+    for i in range(n_rules):
+        constraint = {
+            "id": f"HC-{i:05d}",
+            "category": rng.choice(categories),
+            "rule": f"Synthetic rule {i}.",
+            "jurisdictions": (
+                ["US-FEDERAL"] if rng.random() < 0.2
+                else [f"US-{s}" for s in rng.sample(STATES, rng.randint(1, 3))]
+            ),
+            "severity": "hard",
+        }
+        if rng.random() < 0.5:
+            constraint["thresholds"] = {
+                rng.choice(["total_prize_value_usd", "prize_value_usd"]): rng.choice([500, 600, 2000, 5000])
+            }
+        rules.append(constraint)
+    return rules
+
+
+def synthetic_form(n_prizes: int, rng: random.Random) -> dict:
+    return {
+        "name": "Benchmark Sweepstakes",
+        "door_count": 10,
+        "door_location": "Nationwide",
+        "primary_prize_type": "cash",
+        "states": rng.sample(STATES, 6),
+        "min_age": 18,
+        "start_time": "1/1/2026 12:00 AM ET",
+        "end_time": "2/1/2026 11:59 PM ET",
+        "winner_selection_time": "2/5/2026",
+        "winner_response_deadline": "2/12/2026",
+        "prizes": [
+            {"type": "cash", "amount": float(rng.randint(10, 10_000))}
+            if rng.random() < 0.8 else {"type": "giftcard", "description": "$50 gift card"}
+            for _ in range(n_prizes)
+        ],
+        "entry_method": {"channel": "web", "url": "https://example.com", "required_fields": ["name", "email"]},
+    }
+
+
+# -------------------------------------------------------------------
+# Timing
+# -------------------------------------------------------------------
+def measure(fn, *, min_time: float = 0.5, max_runs: int = 200, min_runs: int = 3) -> dict:
+    fn()  # warm-up
+    samples = []
+    started = time.perf_counter()
+    while len(samples) < min_runs or (len(samples) < max_runs and time.perf_counter() - started < min_time):
+        t0 = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - t0)
+    samples.sort()
+    return {
+        "runs": len(samples),
+        "mean_s": statistics.fmean(samples),
+        "p50_s": samples[len(samples) // 2],
+        "p95_s": samples[min(len(samples) - 1, int(len(samples) * 0.95))],
+        "min_s": samples[0],
+    }
+
+
+# -------------------------------------------------------------------
+# Benchmarks
+# -------------------------------------------------------------------
+def bench_create_document(results: dict, rng: random.Random, prize_sizes: list[int]) -> None:
+    for n in prize_sizes:
+        form = synthetic_form(n, rng)
+        results[f"create_document[prizes={n}]"] = measure(lambda: create_document(from_api_data=form))
+
+
+def bench_apply_hard_constraints(results: dict, rng: random.Random, rule_sizes: list[int], prize_sizes: list[int]) -> None:
+    for n_rules in rule_sizes:
+        constraints = synthetic_constraints(n_rules, rng)
+        compiled = compile_constraints(constraints)
+        results[f"compile_constraints[rules={n_rules}]"] = measure(lambda: compile_constraints(constraints))
+
+        for n_prizes in prize_sizes:
+            doc = create_document(from_api_data=synthetic_form(n_prizes, rng))
+            doc._hard_constraints = constraints
+            doc._compiled_constraints = compiled
+            results[f"apply_hard_constraints[rules={n_rules},prizes={n_prizes}]"] = measure(doc.apply_hard_constraints)
+
+
+def bench_retrieval(results: dict, rng: random.Random, kb_sizes: list[int], constraint_output: dict) -> None:
+    original_path = retrieval.KB_PATH
+    with tempfile.TemporaryDirectory() as tmp:
+        try:
+            for n in kb_sizes:
+                path = Path(tmp) / f"kb_{n}.json"
+                path.write_text(json.dumps(synthetic_kb(n, rng)), encoding="utf-8")
+                retrieval.KB_PATH = path
+
+                def cold():
+                    retrieval.clear_knowledge_base_cache()
+                    retrieval.get_knowledge_base()
+
+                results[f"kb_load_and_index[chunks={n}]"] = measure(cold, min_runs=1, max_runs=5)
+
+                def all_sections():
+                    for section in SECTIONS:
+                        retrieval.retrieve_relevant_chunks_for_section(
+                            constraint_output,
+                            section_category=section["category"],
+                            section_title=section["title"],
+                            top_k=6,
+                            always_include_baseline=True,
+                            min_score=15,
+                        )
+
+                retrieval.get_knowledge_base()
+                results[f"retrieve_all_sections[chunks={n}]"] = measure(all_sections)
+                results[f"retrieve_for_sections[chunks={n}]"] = measure(
+                    lambda: retrieval.retrieve_for_sections(constraint_output, SECTIONS, top_k=6)
+                )
+        finally:
+            retrieval.KB_PATH = original_path
+            retrieval.clear_knowledge_base_cache()
+
+
+def bench_payload(results: dict, rng: random.Random, prize_sizes: list[int], constraint_output: dict) -> None:
+    snippets = [
+        {"id": f"s{i}", "section": "Prize", "text": " ".join(rng.choice(WORDS) for _ in range(150)), "_score": 100 - i}
+        for i in range(6)
+    ]
+    for n in prize_sizes:
+        doc = create_document(from_api_data=synthetic_form(n, rng))
+        promotion_context = _build_promotion_context(doc)
+
+        def build_all():
+            for section in SECTIONS:
+                build_generation_payload(
+                    promotion_context=promotion_context,
+                    compliance_requirements=constraint_output,
+                    historical_snippets=snippets,
+                    section_name=section["title"],
+                    section_category=section["category"],
+                    required_clauses=[],
+                )
+
+        results[f"build_generation_payload_all_sections[prizes={n}]"] = measure(build_all)
+
+
+def bench_docx(results: dict, rng: random.Random, line_counts: list[int]) -> None:
+    for n in line_counts:
+        sections = {
+            s["id"]: "\n".join(" ".join(rng.choice(WORDS) for _ in range(25)) for _ in range(n))
+            for s in SECTIONS
+        }
+        results[f"docx_assembly[lines_per_section={n}]"] = measure(lambda: _build_docx(sections))
+
+
+# -------------------------------------------------------------------
+# CLI
+# -------------------------------------------------------------------
+def git_sha() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=ROOT, capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def compare(current: dict, baseline_path: str, max_regression: float) -> int:
+    with open(baseline_path, "r", encoding="utf-8") as f:
+        baseline = json.load(f)["results"]
+
+    failures = 0
+    print(f"\n{'benchmark':70} {'base p50':>10} {'now p50':>10} {'ratio':>7}")
+    for name, now in current.items():
+        if name not in baseline:
+            continue
+        before = baseline[name]["p50_s"]
+        ratio = now["p50_s"] / before if before else float("inf")
+        flag = "  REGRESSION" if ratio > max_regression else ""
+        failures += bool(flag)
+        print(f"{name:70} {before * 1e3:9.3f}ms {now['p50_s'] * 1e3:9.3f}ms {ratio:6.2f}x{flag}")
+    return 1 if failures else 0
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--quick", action="store_true", help="skip the 100k-chunk KB and 10k-prize inputs")
+    parser.add_argument("--output", help="where to write JSON results")
+    parser.add_argument("--compare", help="baseline JSON results to compare against")
+    parser.add_argument("--max-regression", type=float, default=1.25, help="allowed p50 slowdown ratio")
+    parser.add_argument("--seed", type=int, default=1234)
+    args = parser.parse_args(argv)
+
+    rng = random.Random(args.seed)
+    kb_sizes = [100, 10_000] if args.quick else [100, 10_000, 100_000]
+    rule_sizes = [20, 2_000]
+    prize_sizes = [1, 100] if args.quick else [1, 100, 10_000]
+
+    # Constraint output for retrieval/payload benchmarks (every category active)
+    constraint_output = {
+        "foundational": [{"id": f"F-{s['id']}", "rule": "Synthetic rule.", "category": s["category"]} for s in SECTIONS],
+        "triggered": [],
+        "conditional": [],
+        "evaluated_not_triggered": [],
+    }
+
+    results: dict = {}
+    bench_create_document(results, rng, prize_sizes)
+    bench_apply_hard_constraints(results, rng, rule_sizes, prize_sizes)
+    bench_retrieval(results, rng, kb_sizes, constraint_output)
+    bench_payload(results, rng, prize_sizes, constraint_output)
+    bench_docx(results, rng, [5, 50])
+
+    sha = git_sha()
+    report = {
+        "commit": sha,
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "quick": args.quick,
+        "results": results,
+    }
+
+    output = Path(args.output) if args.output else ROOT / "benchmarks" / "results" / f"{sha}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, indent=2), encoding="utf-8")
+
+    for name, r in results.items():
+        print(f"{name:70} p50={r['p50_s'] * 1e3:9.3f}ms  runs={r['runs']}")
+    print(f"\nResults written to {output}")
+
+    if args.compare:
+        return compare(results, args.compare, args.max_regression)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,117 @@
+"""
+Cold import-time benchmark for the application entry points.
+
+    python -m benchmarks.bench_import                      # api, generate_service, jobs
+    python -m benchmarks.bench_import --runs 20 --max-ms 600
+    python -m benchmarks.bench_import --compare benchmarks/results/import-<sha>.json
+
+Every sample imports the module in a fresh interpreter. The run fails
+when a heavy dependency that is meant to load lazily (openai, httpx,
+python-docx, lxml, numpy, the CLI module) shows up right after
+`import api`, when --max-ms is exceeded, or, with --compare, when an
+import got slower than --max-regression.
+"""
+import sys
+import json
+import time
+import platform
+import argparse
+import statistics
+import subprocess
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from benchmarks.bench_hot_paths import compare, git_sha      # noqa: E402
+
+TARGETS = ("api", "generate_service", "jobs")
+
+# Loaded on first use / by the lifespan warm-up, never by `import api`
+LAZY_MODULES = ("openai", "httpx", "docx", "lxml", "numpy", "main")
+
+_PROBE = """
+import sys, time, json
+t0 = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - t0
+print(json.dumps({{"s": elapsed, "loaded": [m for m in {lazy!r} if m in sys.modules]}}))
+"""
+
+
+def import_once(module: str) -> dict:
+    out = subprocess.run(
+        [sys.executable, "-c", _PROBE.format(module=module, lazy=LAZY_MODULES)],
+        cwd=ROOT, capture_output=True, text=True, check=True,
+    ).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def bench_import(module: str, runs: int) -> tuple[dict, list[str]]:
+    import_once(module)  # warm the OS page cache / .pyc files
+    samples = []
+    loaded: list[str] = []
+    for _ in range(runs):
+        probe = import_once(module)
+        samples.append(probe["s"])
+        loaded = probe["loaded"]
+    samples.sort()
+    return {
+        "runs": len(samples),
+        "mean_s": statistics.fmean(samples),
+        "p50_s": samples[len(samples) // 2],
+        "p95_s": samples[min(len(samples) - 1, int(len(samples) * 0.95))],
+        "min_s": samples[0],
+    }, loaded
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--max-ms", type=float, default=None, help="fail if `import api` p50 exceeds this")
+    parser.add_argument("--output", help="where to write JSON results")
+    parser.add_argument("--compare", help="baseline JSON results to compare against")
+    parser.add_argument("--max-regression", type=float, default=1.25, help="allowed p50 slowdown ratio")
+    args = parser.parse_args(argv)
+
+    results: dict = {}
+    eager: list[str] = []
+    for module in TARGETS:
+        results[f"import[{module}]"], loaded = bench_import(module, args.runs)
+        if module == "api":
+            eager = loaded
+
+    sha = git_sha()
+    report = {
+        "commit": sha,
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "results": results,
+    }
+
+    output = Path(args.output) if args.output else ROOT / "benchmarks" / "results" / f"import-{sha}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, indent=2), encoding="utf-8")
+
+    for name, r in results.items():
+        print(f"{name:30} p50={r['p50_s'] * 1e3:9.3f}ms  min={r['min_s'] * 1e3:9.3f}ms  runs={r['runs']}")
+    print(f"\nResults written to {output}")
+
+    failed = 0
+    if eager:
+        print(f"\nFAIL: `import api` eagerly loads {', '.join(eager)}")
+        failed = 1
+
+    api_ms = results["import[api]"]["p50_s"] * 1e3
+    if args.max_ms is not None and api_ms > args.max_ms:
+        print(f"\nFAIL: `import api` p50 {api_ms:.1f}ms exceeds --max-ms {args.max_ms:.1f}ms")
+        failed = 1
+
+    if args.compare:
+        failed |= compare(results, args.compare, args.max_regression)
+    return failed
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,96 @@
+"""
+Compare the lexical scorer with the optional BM25 engine (needs numpy).
+
+    python -m benchmarks.compare_retrieval                  # checked-in knowledge_base.json
+    python -m benchmarks.compare_retrieval --chunks 10000   # synthetic KB
+
+Prints per-section p50 latency for each scorer and the overlap of their
+top-k results (shared ids / lexical result size, and Jaccard).
+"""
+import sys
+import json
+import random
+import argparse
+import tempfile
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from knowledge import retrieval                                   # noqa: E402
+from generate_service import SECTIONS                             # noqa: E402
+from benchmarks.bench_hot_paths import measure, synthetic_kb      # noqa: E402
+
+
+def compare(constraint_output: dict, top_k: int) -> dict:
+    report = {}
+    for section in SECTIONS:
+        def run(scorer):
+            return retrieval.retrieve_relevant_chunks_for_section(
+                constraint_output,
+                section_category=section["category"],
+                section_title=section["title"],
+                top_k=top_k,
+                always_include_baseline=True,
+                min_score=15,
+                scorer=scorer,
+            )
+
+        lexical = {c["id"] for c in run("lexical")}
+        bm25 = {c["id"] for c in run("bm25")}
+        union = lexical | bm25
+
+        report[section["id"]] = {
+            "lexical_p50_ms": measure(lambda: run("lexical"))["p50_s"] * 1e3,
+            "bm25_p50_ms": measure(lambda: run("bm25"))["p50_s"] * 1e3,
+            "lexical_hits": len(lexical),
+            "bm25_hits": len(bm25),
+            "overlap": (len(lexical & bm25) / len(lexical)) if lexical else None,
+            "jaccard": (len(lexical & bm25) / len(union)) if union else None,
+        }
+    return report
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chunks", type=int, help="use a synthetic KB of this many chunks")
+    parser.add_argument("--top-k", type=int, default=6)
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    args = parser.parse_args(argv)
+
+    # Every section category active, with its category name as the rule text
+    constraint_output = {
+        "foundational": [{"rule": s["title"], "category": s["category"]} for s in SECTIONS],
+        "triggered": [],
+    }
+
+    original_path = retrieval.KB_PATH
+    with tempfile.TemporaryDirectory() as tmp:
+        try:
+            if args.chunks:
+                path = Path(tmp) / "kb.json"
+                path.write_text(json.dumps(synthetic_kb(args.chunks, random.Random(1234))), encoding="utf-8")
+                retrieval.KB_PATH = path
+            else:
+                retrieval.KB_PATH = ROOT / "knowledge_base.json"
+            retrieval.clear_knowledge_base_cache()
+
+            report = compare(constraint_output, args.top_k)
+        finally:
+            retrieval.KB_PATH = original_path
+            retrieval.clear_knowledge_base_cache()
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return 0
+
+    print(f"{'section':20} {'lexical p50':>12} {'bm25 p50':>10} {'overlap':>8} {'jaccard':>8}")
+    for section_id, r in report.items():
+        overlap = "-" if r["overlap"] is None else f"{r['overlap']:.2f}"
+        jaccard = "-" if r["jaccard"] is None else f"{r['jaccard']:.2f}"
+        print(f"{section_id:20} {r['lexical_p50_ms']:10.3f}ms {r['bm25_p50_ms']:8.3f}ms {overlap:>8} {jaccard:>8}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
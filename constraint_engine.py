@@ -0,0 +1,168 @@
+import os
+import json
+import threading
+from bisect import bisect_left
+
+
+# -------------------------------------------------------------------
+# Compiled hard-constraint rule set
+#
+# The JSON file is compiled once per process (revalidated by mtime/size):
+#   - foundational federal rules pre-split (no evaluation needed)
+#   - jurisdiction -> rules index for state matching
+#   - thresholds sorted so one bisect per aggregate decides every rule
+# Evaluation produces exactly the buckets Document.apply_hard_constraints
+# has always produced, in file order.
+# -------------------------------------------------------------------
+
+class CompiledRule:
+    __slots__ = ("order", "id", "rule", "category", "jurisdictions", "federal", "total_threshold", "prize_threshold")
+
+    def __init__(self, order: int, constraint: dict):
+        thresholds = constraint.get("thresholds", {})
+        self.order = order
+        self.id = constraint.get("id")
+        self.rule = constraint["rule"]
+        self.category = constraint.get("category")
+        self.jurisdictions = frozenset(constraint.get("jurisdictions", []))
+        self.federal = "US-FEDERAL" in self.jurisdictions
+        self.total_threshold = thresholds.get("total_prize_value_usd")
+        self.prize_threshold = thresholds.get("prize_value_usd")
+
+    def entry(self, reason: str) -> dict:
+        return {
+            "id": self.id,
+            "rule": self.rule,
+            "category": self.category,
+            "reason": reason
+        }
+
+
+class CompiledConstraints:
+    def __init__(self, constraints: list[dict]):
+        self.source = constraints
+
+        self.foundational: list[CompiledRule] = []
+        self.rules: list[CompiledRule] = []              # everything that needs evaluation
+        self.federal: list[CompiledRule] = []            # evaluated rules that always match
+        self.by_jurisdiction: dict[str, list[CompiledRule]] = {}
+
+        for order, constraint in enumerate(constraints):
+            rule = CompiledRule(order, constraint)
+
+            # ---- Foundational rules (always true federal rules, no thresholds) ----
+            if rule.federal and not constraint.get("thresholds", {}):
+                self.foundational.append(rule)
+                continue
+
+            self.rules.append(rule)
+            if rule.federal:
+                self.federal.append(rule)
+            else:
+                for j in rule.jurisdictions:
+                    self.by_jurisdiction.setdefault(j, []).append(rule)
+
+        # (threshold, order) sorted ascending -> rules passing a value form a prefix
+        self._total_thresholds = sorted(
+            (r.total_threshold, r.order) for r in self.rules if r.total_threshold is not None
+        )
+        self._prize_thresholds = sorted(
+            (r.prize_threshold, r.order) for r in self.rules if r.prize_threshold is not None
+        )
+        self._total_keys = [t for t, _ in self._total_thresholds]
+        self._prize_keys = [t for t, _ in self._prize_thresholds]
+
+    def _passing(self, keys: list, pairs: list, value: float | None) -> set[int]:
+        # Rule passes when value > threshold, i.e. every threshold strictly below value
+        if value is None:
+            return set()
+        return {order for _, order in pairs[:bisect_left(keys, value)]}
+
+    def evaluate(self, state_codes: set[str], total_prize_value: float, max_prize_value: float | None) -> dict:
+        """
+        `state_codes` are "US-XX" codes; `max_prize_value` is the largest
+        cash prize, or None when there is no cash prize with an amount.
+        """
+        total_passing = self._passing(self._total_keys, self._total_thresholds, total_prize_value)
+        prize_passing = self._passing(self._prize_keys, self._prize_thresholds, max_prize_value)
+
+        matched = {r.order for r in self.federal}
+        for code in state_codes:
+            for r in self.by_jurisdiction.get(code, ()):
+                matched.add(r.order)
+
+        triggered = []
+        conditional = []
+        evaluated_not_triggered = []
+
+        for r in self.rules:
+            if r.order not in matched:
+                conditional.append(r.entry("Applies only if certain actions or configurations are used"))
+                continue
+
+            # ---- Threshold-based checks ----
+            threshold_failed = False
+            reasons = []
+
+            if r.total_threshold is not None:
+                if r.order in total_passing:
+                    reasons.append(
+                        f"Total prize value (${total_prize_value}) exceeds "
+                        f"${r.total_threshold}"
+                    )
+                else:
+                    threshold_failed = True
+
+            if r.prize_threshold is not None:
+                if r.order in prize_passing:
+                    reasons.append(
+                        f"At least one prize exceeds ${r.prize_threshold}"
+                    )
+                else:
+                    threshold_failed = True
+
+            if not threshold_failed:
+                triggered.append(r.entry(
+                    "; ".join(reasons) if reasons else "Promotion configuration triggered this rule"
+                ))
+            else:
+                evaluated_not_triggered.append(r.entry("Jurisdiction applicable, but thresholds not met"))
+
+        return {
+            "foundational": [r.entry("Applies to all U.S. sweepstakes") for r in self.foundational],
+            "triggered": triggered,
+            "conditional": conditional,
+            "evaluated_not_triggered": evaluated_not_triggered
+        }
+
+
+# -------------------------------------------------------------------
+# Process-wide cache (keyed by absolute path, revalidated by mtime/size)
+# -------------------------------------------------------------------
+_compiled_lock = threading.Lock()
+_compiled_cache: dict[str, tuple[tuple[int, int], CompiledConstraints]] = {}
+
+
+def compile_constraints(constraints: list[dict]) -> CompiledConstraints:
+    return CompiledConstraints(constraints)
+
+
+def get_compiled_constraints(path: str) -> CompiledConstraints:
+    key = os.path.abspath(path)
+    st = os.stat(key)
+    signature = (st.st_mtime_ns, st.st_size)
+
+    cached = _compiled_cache.get(key)
+    if cached is not None and cached[0] == signature:
+        return cached[1]
+
+    with _compiled_lock:
+        cached = _compiled_cache.get(key)
+        if cached is not None and cached[0] == signature:
+            return cached[1]
+
+        with open(key, "r") as f:
+            data = json.load(f)
+        compiled = compile_constraints(data["constraints"])
+        _compiled_cache[key] = (signature, compiled)
+        return compiled
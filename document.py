@@ -1,6 +1,6 @@
 from enum import Enum
 from typing import Literal, Dict
-import json
+from constraint_engine import CompiledConstraints, compile_constraints, get_compiled_constraints
 
 
 STATE_NAME_TO_CODE = {
@@ -91,6 +91,7 @@ class Document:
         self._winnerResponseTime: str
         self._prizeLevels: Dict[int, Prize] = {}
         self._hard_constraints = []
+        self._compiled_constraints: CompiledConstraints | None = None
         self._entryChannel: str | None = None
         self._entryUrl: str | None = None
         self._entryFields: list[str] = []
@@ -98,74 +99,108 @@ class Document:
     def _safe_filename(self) -> str:
         return self._name.strip().replace(" ", "_") + ".txt"
 
+    def compliance_report(self) -> dict:
+        """
+        JSON-ready compliance report. Requires apply_hard_constraints().
+        """
+        return {
+            "document": {
+                "name": self._name,
+                "door_count": self._doorCount,
+                "door_location": self._doorLocation,
+                "primary_prize_type": self._prizes.value,
+                "min_age": self._minAge,
+                "eligible_states": list(self._residence or []),
+                "start_time": self._startTime,
+                "end_time": self._endTime,
+                "winner_selection_time": self._winnerTime,
+                "winner_response_deadline": self._winnerResponseTime,
+            },
+            "prize_levels": [
+                {
+                    "level": level,
+                    "type": prize.prize_type.value,
+                    "amount": prize.amount,
+                    "description": prize.description,
+                }
+                for level, prize in self._prizeLevels.items()
+            ],
+            "requirements": self._constraint_output,
+            "warnings": list(self._constraint_warnings),
+        }
+
+    def render_compliance_report(self) -> str:
+        """
+        Plain-text compliance report, built in memory.
+        """
+        lines = [
+            "SWEEPSTAKES COMPLIANCE REPORT",
+            "=" * 32,
+            "",
+            "DOCUMENT INFORMATION",
+            "-" * 22,
+            f"Sweepstakes Name: {self._name}",
+            f"Door Count: {self._doorCount}",
+            f"Door Location: {self._doorLocation}",
+            f"Primary Prize Type: {self._prizes.value}",
+            f"Minimum Age: {self._minAge}",
+            f"Eligible States: {', '.join(self._residence or [])}",
+            f"Start Time: {self._startTime}",
+            f"End Time: {self._endTime}",
+            f"Winner Selection Time: {self._winnerTime}",
+            f"Winner Response Deadline: {self._winnerResponseTime}",
+            "",
+            "PRIZE LEVELS",
+            "-" * 12,
+        ]
+        for level, prize in self._prizeLevels.items():
+            if prize.prize_type.name == "CASH":
+                lines.append(f"Level {level}: Cash - ${prize.amount}")
+            else:
+                lines.append(f"Level {level}: Gift Card - {prize.description}")
+        lines.append("")
+
+        lines += ["COMPLIANCE REQUIREMENTS SUMMARY", "-" * 32, ""]
+
+        sections = self._constraint_output
+
+        # ---- Foundational ----
+        lines += ["FOUNDATIONAL LEGAL REQUIREMENTS", "-" * 32]
+        lines += [f"- {c['rule']}" for c in sections["foundational"]]
+        lines.append("")
+
+        # ---- Triggered ----
+        lines += ["REQUIREMENTS TRIGGERED BY THIS PROMOTION", "-" * 40]
+        lines += [f"- {c['rule']} ({c['reason']})" for c in sections["triggered"]]
+        lines.append("")
+
+        # ---- Conditional ----
+        lines += ["CONDITIONAL / RISK-BASED REQUIREMENTS", "-" * 40]
+        lines += [f"- {c['rule']} ({c['reason']})" for c in sections["conditional"]]
+        lines.append("")
+
+        # ---- Evaluated but Not Triggered ----
+        if sections["evaluated_not_triggered"]:
+            lines += ["RULES EVALUATED BUT NOT TRIGGERED", "-" * 36]
+            lines += [f"- {c['rule']} ({c['reason']})" for c in sections["evaluated_not_triggered"]]
+            lines.append("")
+
+        # ---- Input normalization ----
+        if self._constraint_warnings:
+            lines += ["WARNINGS", "-" * 8]
+            lines += [f"- {w}" for w in self._constraint_warnings]
+            lines.append("")
+
+        return "\n".join(lines) + "\n"
+
     def write_compliance_report(self) -> None:
+        # CLI convenience only; the API serves render_compliance_report() directly
         filename = self._safe_filename()
 
         with open(filename, "w") as f:
-            f.write("SWEEPSTAKES COMPLIANCE REPORT\n")
-            f.write("=" * 32 + "\n\n")
-
-            f.write("DOCUMENT INFORMATION\n")
-            f.write("-" * 22 + "\n")
-            f.write(f"Sweepstakes Name: {self._name}\n")
-            f.write(f"Door Count: {self._doorCount}\n")
-            f.write(f"Door Location: {self._doorLocation}\n")
-            f.write(f"Primary Prize Type: {self._prizes.value}\n")
-            f.write(f"Minimum Age: {self._minAge}\n")
-            f.write(f"Eligible States: {', '.join(self._residence or [])}\n")
-            f.write(f"Start Time: {self._startTime}\n")
-            f.write(f"End Time: {self._endTime}\n")
-            f.write(f"Winner Selection Time: {self._winnerTime}\n")
-            f.write(f"Winner Response Deadline: {self._winnerResponseTime}\n\n")
-
-            f.write("PRIZE LEVELS\n")
-            f.write("-" * 12 + "\n")
-            for level, prize in self._prizeLevels.items():
-                if prize.prize_type.name == "CASH":
-                    f.write(f"Level {level}: Cash - ${prize.amount}\n")
-                else:
-                    f.write(f"Level {level}: Gift Card - {prize.description}\n")
-            f.write("\n")
-
-
-            f.write("COMPLIANCE REQUIREMENTS SUMMARY\n")
-            f.write("-" * 32 + "\n\n")
-
-            sections = self._constraint_output
-
-            # ---- Foundational ----
-            f.write("FOUNDATIONAL LEGAL REQUIREMENTS\n")
-            f.write("-" * 32 + "\n")
-            for c in sections["foundational"]:
-                f.write(f"- {c['rule']}\n")
-            f.write("\n")
-
-            # ---- Triggered ----
-            f.write("REQUIREMENTS TRIGGERED BY THIS PROMOTION\n")
-            f.write("-" * 40 + "\n")
-            for c in sections["triggered"]:
-                f.write(f"- {c['rule']} ({c['reason']})\n")
-            f.write("\n")
-
-            # ---- Conditional ----
-            f.write("CONDITIONAL / RISK-BASED REQUIREMENTS\n")
-            f.write("-" * 40 + "\n")
-            for c in sections["conditional"]:
-                f.write(f"- {c['rule']} ({c['reason']})\n")
-            f.write("\n")
-
-            # ---- Evaluated but Not Triggered ----
-            if sections["evaluated_not_triggered"]:
-                f.write("RULES EVALUATED BUT NOT TRIGGERED\n")
-                f.write("-" * 36 + "\n")
-                for c in sections["evaluated_not_triggered"]:
-                    f.write(f"- {c['rule']} ({c['reason']})\n")
-                f.write("\n")
-
-            print(f"\n📄 Compliance report written to: {filename}")
-
-
+            f.write(self.render_compliance_report())
 
+        print(f"\n📄 Compliance report written to: {filename}")
 
 
     def _total_prize_value(self) -> float:
@@ -190,9 +225,9 @@ class Document:
         return False
 
     def load_hard_constraints(self, path: str) -> None:
-        with open(path, "r") as f:
-            data = json.load(f)
-        self._hard_constraints = data["constraints"]
+        # Parsed + compiled once per process; reloaded only if the file changes
+        self._compiled_constraints = get_compiled_constraints(path)
+        self._hard_constraints = self._compiled_constraints.source
 
     def validate(self) -> None:
         if not self._name:
@@ -248,10 +283,6 @@ class Document:
     
     
     def apply_hard_constraints(self) -> None:
-        foundational = []
-        triggered = []
-        conditional = []
-        evaluated_not_triggered = []
         warnings = []
 
         # ---- Normalize states ----
@@ -271,81 +302,23 @@ class Document:
                 )
 
         state_codes = {f"US-{s}" for s in normalized_states}
-        total_prize_value = self._total_prize_value()
-
-        for constraint in self._hard_constraints:
-            jurisdictions = set(constraint.get("jurisdictions", []))
-            thresholds = constraint.get("thresholds", {})
-            cid = constraint.get("id")
-            rule = constraint["rule"]
-            category = constraint.get("category")
-
-
-            # ---- Foundational rules (always true federal rules, no thresholds) ----
-            if "US-FEDERAL" in jurisdictions and not thresholds:
-                foundational.append({
-                    "id": cid,
-                    "rule": rule,
-                    "category": category,
-                    "reason": "Applies to all U.S. sweepstakes"
-                })
-                continue
-
-            # ---- Threshold-based checks ----
-            threshold_failed = False
-            reasons = []
-
-            if "total_prize_value_usd" in thresholds:
-                if total_prize_value > thresholds["total_prize_value_usd"]:
-                    reasons.append(
-                        f"Total prize value (${total_prize_value}) exceeds "
-                        f"${thresholds['total_prize_value_usd']}"
-                    )
-                else:
-                    threshold_failed = True
-
-            if "prize_value_usd" in thresholds:
-                if self._any_prize_exceeds(thresholds["prize_value_usd"]):
-                    reasons.append(
-                        f"At least one prize exceeds ${thresholds['prize_value_usd']}"
-                    )
-                else:
-                    threshold_failed = True
-            # ---- Jurisdiction match ----
-            jurisdiction_match = (
-                "US-FEDERAL" in jurisdictions
-                or jurisdictions.intersection(state_codes)
-            )
-
-            # ---- Categorize ----
-            if jurisdiction_match and not threshold_failed:
-                triggered.append({
-                    "id": cid,
-                    "rule": rule,
-                    "category": category,
-                    "reason": "; ".join(reasons) if reasons else "Promotion configuration triggered this rule"
-                })
-            elif jurisdiction_match:
-                evaluated_not_triggered.append({
-                    "id": cid,
-                    "rule": rule,
-                    "category": category,
-                    "reason": "Jurisdiction applicable, but thresholds not met"
-                })
-            else:
-                conditional.append({
-                    "id": cid,
-                    "rule": rule,
-                    "category": category,
-                    "reason": "Applies only if certain actions or configurations are used"
-                })
-
-        self._constraint_output = {
-            "foundational": foundational,
-            "triggered": triggered,
-            "conditional": conditional,
-            "evaluated_not_triggered": evaluated_not_triggered
-        }
+
+        compiled = self._compiled_constraints
+        if compiled is None or compiled.source is not self._hard_constraints:
+            compiled = compile_constraints(self._hard_constraints)
+
+        # Prize aggregates are computed once, not once per constraint
+        cash_amounts = [
+            float(p.amount)
+            for p in self._prizeLevels.values()
+            if p.prize_type == PrizeType.CASH and p.amount
+        ]
+
+        self._constraint_output = compiled.evaluate(
+            state_codes,
+            total_prize_value=self._total_prize_value(),
+            max_prize_value=max(cash_amounts) if cash_amounts else None,
+        )
 
         self._constraint_warnings = warnings
 
@@ -0,0 +1,209 @@
+import struct
+import threading
+import time
+import zipfile
+import zlib
+from dataclasses import dataclass
+from io import BytesIO
+
+# -------------------------------------------------------------------
+# Streaming .docx writer
+#
+# The base document (styles, theme, title heading) is built once per
+# process and its static parts are kept pre-compressed. A request then
+# only renders its own section paragraphs and streams the zip as it goes:
+#
+#   static parts | word/document.xml (prefix, sections..., suffix) | central dir
+#
+# document.xml is written last with a data descriptor, so nothing has to
+# be seeked back to and no full document is ever held in memory.
+#
+# python-docx/lxml are imported on first use, keeping them off the
+# application's import path.
+# -------------------------------------------------------------------
+
+DOCUMENT_PART = "word/document.xml"
+TITLE = "OFFICIAL SWEEPSTAKES RULES"
+
+_LOCAL_HEADER = struct.Struct("<IHHHHHIIIHH")
+_CENTRAL_HEADER = struct.Struct("<IHHHHHHIIIHHHHHII")
+_END_RECORD = struct.Struct("<IHHHHIIH")
+_DATA_DESCRIPTOR = struct.Struct("<IIII")
+
+_VERSION = 20            # 2.0: deflate
+_FLAG_DESCRIPTOR = 0x08  # crc/sizes follow the data
+
+
+@dataclass(frozen=True)
+class _Part:
+    name: bytes
+    crc: int
+    size: int
+    data: bytes          # raw deflate stream
+
+
+@dataclass(frozen=True)
+class DocxTemplate:
+    parts: tuple[_Part, ...]
+    prefix: bytes        # document.xml up to and including the title heading
+    suffix: bytes        # final sectPr and closing tags
+    heading_style: str   # style id used for section headings
+
+
+def _deflate(data: bytes) -> bytes:
+    compressor = zlib.compressobj(zlib.Z_DEFAULT_COMPRESSION, zlib.DEFLATED, -15)
+    return compressor.compress(data) + compressor.flush()
+
+
+def build_template(title: str = TITLE) -> DocxTemplate:
+    from docx import Document
+
+    document = Document()
+    document.add_heading(title, level=1)
+    heading_style = document.styles["Heading 2"].style_id
+
+    buffer = BytesIO()
+    document.save(buffer)
+
+    parts = []
+    with zipfile.ZipFile(buffer) as archive:
+        for name in archive.namelist():
+            data = archive.read(name)
+            if name == DOCUMENT_PART:
+                # Split right before the body's section properties
+                cut = data.rindex(b"<w:sectPr")
+                prefix, suffix = data[:cut], data[cut:]
+                continue
+            parts.append(_Part(name.encode("utf-8"), zlib.crc32(data), len(data), _deflate(data)))
+
+    return DocxTemplate(tuple(parts), prefix, suffix, heading_style)
+
+
+_template: DocxTemplate | None = None
+_template_lock = threading.Lock()
+
+
+def get_docx_template() -> DocxTemplate:
+    """
+    Process-wide template, built on first use.
+    """
+    global _template
+    if _template is None:
+        with _template_lock:
+            if _template is None:
+                _template = build_template()
+    return _template
+
+
+def render_section_xml(title: str, content: str, heading_style: str) -> bytes:
+    """
+    Body XML for one section: a heading, then one paragraph per line
+    (same markup python-docx produces for add_heading/add_paragraph).
+    """
+    from docx.oxml import OxmlElement
+    from docx.text.paragraph import Paragraph
+    from lxml import etree
+
+    body = OxmlElement("w:body")
+
+    heading = OxmlElement("w:p")
+    body.append(heading)
+    heading.style = heading_style
+    Paragraph(heading, None).add_run(title)
+
+    for line in content.split("\n"):
+        p = OxmlElement("w:p")
+        body.append(p)
+        if line:
+            Paragraph(p, None).add_run(line)
+
+    # Serialize inside the wrapper so children don't redeclare namespaces
+    xml = etree.tostring(body, encoding="utf-8")
+    return xml[xml.index(b">") + 1:xml.rindex(b"</w:body>")]
+
+
+def _dos_time(timestamp: float) -> tuple[int, int]:
+    t = time.localtime(timestamp)
+    return (
+        (t.tm_hour << 11) | (t.tm_min << 5) | (t.tm_sec // 2),
+        ((t.tm_year - 1980) << 9) | (t.tm_mon << 5) | t.tm_mday,
+    )
+
+
+class DocxStream:
+    """
+    Incremental .docx encoder. Call begin(), add_section() once per
+    section in document order, then finish(); each returns the bytes to
+    send next (possibly empty while the compressor is buffering).
+    """
+
+    def __init__(self, template: DocxTemplate | None = None):
+        self.template = template or get_docx_template()
+        self._mtime, self._mdate = _dos_time(time.time())
+        self._offset = 0
+        self._central: list[bytes] = []
+
+        self._compressor = zlib.compressobj(zlib.Z_DEFAULT_COMPRESSION, zlib.DEFLATED, -15)
+        self._crc = 0
+        self._size = 0
+        self._compressed = 0
+        self._document_offset = 0
+
+    # ---- zip records ----
+    def _entry(self, name: bytes, flags: int, crc: int, csize: int, size: int) -> bytes:
+        header = _LOCAL_HEADER.pack(
+            0x04034B50, _VERSION, flags, zipfile.ZIP_DEFLATED, self._mtime, self._mdate,
+            crc, csize, size, len(name), 0,
+        ) + name
+        self._offset += len(header)
+        return header
+
+    def _record_central(self, name: bytes, flags: int, crc: int, csize: int, size: int, offset: int) -> None:
+        self._central.append(_CENTRAL_HEADER.pack(
+            0x02014B50, _VERSION, _VERSION, flags, zipfile.ZIP_DEFLATED, self._mtime, self._mdate,
+            crc, csize, size, len(name), 0, 0, 0, 0, 0, offset,
+        ) + name)
+
+    def _document_bytes(self, data: bytes) -> bytes:
+        self._crc = zlib.crc32(data, self._crc)
+        self._size += len(data)
+        out = self._compressor.compress(data)
+        self._compressed += len(out)
+        self._offset += len(out)
+        return out
+
+    # ---- public API ----
+    def begin(self) -> bytes:
+        out = bytearray()
+        for part in self.template.parts:
+            offset = self._offset
+            out += self._entry(part.name, 0, part.crc, len(part.data), part.size)
+            out += part.data
+            self._offset += len(part.data)
+            self._record_central(part.name, 0, part.crc, len(part.data), part.size, offset)
+
+        self._document_offset = self._offset
+        out += self._entry(DOCUMENT_PART.encode("utf-8"), _FLAG_DESCRIPTOR, 0, 0, 0)
+        out += self._document_bytes(self.template.prefix)
+        return bytes(out)
+
+    def add_section(self, title: str, content: str) -> bytes:
+        return self._document_bytes(render_section_xml(title, content, self.template.heading_style))
+
+    def finish(self) -> bytes:
+        out = bytearray(self._document_bytes(self.template.suffix))
+        tail = self._compressor.flush()
+        self._compressed += len(tail)
+        out += tail
+
+        crc = self._crc & 0xFFFFFFFF
+        out += _DATA_DESCRIPTOR.pack(0x08074B50, crc, self._compressed, self._size)
+        self._offset += len(tail) + _DATA_DESCRIPTOR.size
+        self._record_central(
+            DOCUMENT_PART.encode("utf-8"), _FLAG_DESCRIPTOR, crc, self._compressed, self._size, self._document_offset
+        )
+
+        directory = b"".join(self._central)
+        out += directory
+        out += _END_RECORD.pack(0x06054B50, 0, 0, len(self._central), len(self._central), len(directory), self._offset, 0)
+        return bytes(out)
@@ -0,0 +1,240 @@
+import os
+import json
+import time
+import uuid
+import sqlite3
+import threading
+from dataclasses import dataclass
+
+from sections import SECTIONS
+
+# -------------------------------------------------------------------
+# Server-side drafts.
+#
+# A draft keeps the form, the promotion_context / constraint buckets it
+# was generated from and the text of every section. A field-level patch
+# is diffed against those inputs, and only the sections that depend on
+# something that changed are regenerated; the rest of the .docx is
+# reassembled from the stored text.
+# -------------------------------------------------------------------
+DRAFTS_DB_PATH = os.getenv("DRAFTS_DB_PATH", ".drafts.sqlite3")
+DRAFT_TTL = float(os.getenv("DRAFT_TTL", str(30 * 24 * 3600)))
+
+ALL_SECTIONS = tuple(section["id"] for section in SECTIONS)
+
+# promotion_context field -> sections whose text is drawn from it.
+# A field missing here (e.g. one added to the context later) conservatively
+# invalidates every section.
+CONTEXT_DEPENDENCIES: dict[str, tuple[str, ...]] = {
+    "name": ALL_SECTIONS,
+    "states": ("eligibility",),
+    "min_age": ("eligibility",),
+    "start_time": ("classification", "entry_method"),
+    "end_time": ("classification", "entry_method"),
+    "winner_selection_time": ("prizes", "winner_clearance"),
+    "winner_response_deadline": ("winner_clearance",),
+    "primary_prize_type": ("prizes",),
+    "prizes": ("prizes",),
+    "total_prize_value": ("prizes",),
+    "entry_method": ("entry_method",),
+    "in_store_entry": ("entry_method",),
+}
+
+# Rule category -> the section that drafts it
+CATEGORY_SECTIONS: dict[str, tuple[str, ...]] = {}
+for _section in SECTIONS:
+    CATEGORY_SECTIONS.setdefault(_section["category"], ())
+    CATEGORY_SECTIONS[_section["category"]] += (_section["id"],)
+
+
+class DraftConflict(Exception):
+    """
+    The draft was changed by another request since it was read.
+    """
+
+
+@dataclass(frozen=True)
+class Draft:
+    id: str
+    version: int
+    form: dict
+    promotion_context: dict
+    compliance_requirements: dict
+    sections: dict[str, str]
+    created: float
+    updated: float
+
+
+# -------------------------------------------------------------------
+# Patch + dependency analysis
+# -------------------------------------------------------------------
+def merge_patch(target: dict, patch: dict) -> dict:
+    """
+    JSON Merge Patch (RFC 7396): objects merge key by key, null removes
+    a key, anything else (including lists such as `prizes`) replaces.
+    """
+    result = dict(target)
+    for key, value in patch.items():
+        if value is None:
+            result.pop(key, None)
+        elif isinstance(value, dict) and isinstance(result.get(key), dict):
+            result[key] = merge_patch(result[key], value)
+        else:
+            result[key] = value
+    return result
+
+
+def _canonical(value) -> str:
+    # Stored drafts went through JSON; compare both sides in that form
+    return json.dumps(value, sort_keys=True)
+
+
+def _rule_buckets(compliance_requirements: dict) -> dict[str, tuple[str, str | None]]:
+    return {
+        rule.get("id"): (bucket, rule.get("category"))
+        for bucket, rules in compliance_requirements.items()
+        for rule in rules
+    }
+
+
+def affected_sections(
+    old_context: dict,
+    new_context: dict,
+    old_requirements: dict,
+    new_requirements: dict,
+) -> set[str]:
+    """
+    Sections whose inputs differ between two generations: changed
+    promotion_context fields through CONTEXT_DEPENDENCIES, plus every
+    rule that moved between constraint buckets (e.g. a prize amount
+    crossing the HC-013 bonding threshold) through its category.
+    """
+    affected: set[str] = set()
+
+    for field in old_context.keys() | new_context.keys():
+        if _canonical(old_context.get(field)) != _canonical(new_context.get(field)):
+            affected.update(CONTEXT_DEPENDENCIES.get(field, ALL_SECTIONS))
+
+    old_rules = _rule_buckets(old_requirements)
+    new_rules = _rule_buckets(new_requirements)
+    for rule_id in old_rules.keys() | new_rules.keys():
+        before, after = old_rules.get(rule_id), new_rules.get(rule_id)
+        if before == after:
+            continue
+        for bucket_category in (before, after):
+            if bucket_category is not None:
+                affected.update(CATEGORY_SECTIONS.get(bucket_category[1], ALL_SECTIONS))
+
+    return affected
+
+
+# -------------------------------------------------------------------
+# Storage
+# -------------------------------------------------------------------
+class DraftStore:
+    def __init__(self, path: str):
+        self.path = path
+        self._initialized = False
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=30)
+        if not self._initialized:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS drafts (
+                    id           TEXT PRIMARY KEY,
+                    version      INTEGER NOT NULL,
+                    form         TEXT NOT NULL,
+                    context      TEXT NOT NULL,
+                    requirements TEXT NOT NULL,
+                    sections     TEXT NOT NULL,
+                    created      REAL NOT NULL,
+                    updated      REAL NOT NULL
+                )
+                """
+            )
+            conn.commit()
+            self._initialized = True
+        return conn
+
+    def create(self, form: dict, promotion_context: dict, compliance_requirements: dict, sections: dict[str, str]) -> str:
+        draft_id = uuid.uuid4().hex
+        now = time.time()
+        conn = self._connect()
+        try:
+            with conn:
+                # Expired drafts are dropped as new ones come in
+                conn.execute("DELETE FROM drafts WHERE updated < ?", (now - DRAFT_TTL,))
+                conn.execute(
+                    "INSERT INTO drafts (id, version, form, context, requirements, sections, created, updated) "
+                    "VALUES (?, 1, ?, ?, ?, ?, ?, ?)",
+                    (
+                        draft_id, json.dumps(form), json.dumps(promotion_context),
+                        json.dumps(compliance_requirements), json.dumps(sections), now, now,
+                    ),
+                )
+        finally:
+            conn.close()
+        return draft_id
+
+    def get(self, draft_id: str) -> Draft | None:
+        conn = self._connect()
+        try:
+            row = conn.execute(
+                "SELECT version, form, context, requirements, sections, created, updated FROM drafts WHERE id = ?",
+                (draft_id,),
+            ).fetchone()
+        finally:
+            conn.close()
+        if row is None:
+            return None
+
+        version, form, context, requirements, sections, created, updated = row
+        return Draft(
+            draft_id, version, json.loads(form), json.loads(context),
+            json.loads(requirements), json.loads(sections), created, updated,
+        )
+
+    def update(
+        self,
+        draft_id: str,
+        version: int,
+        form: dict,
+        promotion_context: dict,
+        compliance_requirements: dict,
+        sections: dict[str, str],
+    ) -> int:
+        """
+        Store a new revision on top of `version`. Returns the new version;
+        raises DraftConflict if someone else stored one first.
+        """
+        conn = self._connect()
+        try:
+            with conn:
+                cur = conn.execute(
+                    "UPDATE drafts SET version = version + 1, form = ?, context = ?, requirements = ?, "
+                    "sections = ?, updated = ? WHERE id = ? AND version = ?",
+                    (
+                        json.dumps(form), json.dumps(promotion_context), json.dumps(compliance_requirements),
+                        json.dumps(sections), time.time(), draft_id, version,
+                    ),
+                )
+        finally:
+            conn.close()
+        if cur.rowcount != 1:
+            raise DraftConflict(f"Draft {draft_id} was modified concurrently")
+        return version + 1
+
+
+_store: DraftStore | None = None
+_store_lock = threading.Lock()
+
+
+def get_draft_store() -> DraftStore:
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = DraftStore(DRAFTS_DB_PATH)
+    return _store
@@ -1,14 +1,30 @@
+import asyncio
+import json
+import logging
+import os
+import re
+import time
+import zipfile
+
 from document import create_document
-from knowledge.retrieval import retrieve_relevant_chunks_for_section
+from constraint_engine import get_compiled_constraints
+from knowledge.retrieval import retrieve_for_sections, retrieval_key, preload_knowledge_base
 from generation.payload_builder import build_generation_payload
-from generation.generate import generate_text
-from docx import Document
+from generation.generate import (
+    generate_text_async, get_client, get_async_client, GenerationError, OutputRejected, OPENAI_MAX_OUTPUT_TOKENS,
+)
+from generation.section_templates import TEMPLATE, SectionTemplate, get_section_template, render_section, fill_in_payload
+from metrics import stage_timer, SECTION_RETRIES, CLAUSE_APPENDS, LLM_ERRORS, PROMPT_TOKENS
+from docx_writer import DocxStream, get_docx_template
+from drafts import Draft, affected_sections, get_draft_store
 from io import BytesIO
 from dotenv import load_dotenv
 
 load_dotenv()
 
-from main import SECTIONS
+from sections import SECTIONS
+
+logger = logging.getLogger(__name__)
 
 
 # -------------------------------------------------------------------
@@ -64,6 +80,32 @@ def _missing_required_clauses(section_text: str, required_clauses: list[dict]) -
     return missing
 
 
+# Words of a mandatory clause that mark the model as writing it out
+CLAUSE_OPENING_WORDS = 8
+
+
+def _diverged_clauses(section_text: str, required_clauses: list[dict]) -> list[dict]:
+    """
+    Clauses the draft started verbatim (first CLAUSE_OPENING_WORDS words)
+    but then reworded, without the exact text appearing anywhere. Works on
+    a partial draft: an opening that is still being written isn't counted.
+    """
+    text_lower = (section_text or "").lower()
+    diverged = []
+    for c in required_clauses:
+        clause_text = (c.get("text") or "").strip().lower()
+        if not clause_text or clause_text in text_lower:
+            continue
+        opening = " ".join(clause_text.split()[:CLAUSE_OPENING_WORDS])
+        start = text_lower.find(opening)
+        while start != -1:
+            if not clause_text.startswith(text_lower[start:start + len(clause_text)]):
+                diverged.append(c)
+                break
+            start = text_lower.find(opening, start + 1)
+    return diverged
+
+
 def _looks_truncated(section_text: str) -> bool:
     """
     Cheap truncation heuristic to catch outputs that end mid-sentence.
@@ -80,15 +122,12 @@ def _looks_truncated(section_text: str) -> bool:
     )
 
 
-def generate_official_rules(form_data: dict):
+SECTION_CONCURRENCY = int(os.getenv("SECTION_CONCURRENCY", "6"))
+HARD_CONSTRAINTS_PATH = "hard_constraints.json"
 
-    # Build document using provided data instead of CLI prompts
-    doc = create_document(from_api_data=form_data)
-    doc.load_hard_constraints("hard_constraints.json")
-    doc.apply_hard_constraints()
-    doc.validate()
 
-    promotion_context = {
+def _build_promotion_context(doc) -> dict:
+    return {
         "name": doc._name,
         "states": doc._residence,
         "min_age": doc._minAge,
@@ -117,31 +156,88 @@ def generate_official_rules(form_data: dict):
         "in_store_entry": doc._inPersonEntry
     }
 
-    compliance_requirements = doc._constraint_output
-    generated_sections: dict[str, str] = {}
 
-    for section in SECTIONS:
+def _load_document(form_data: dict):
+    # Build document using provided data instead of CLI prompts
+    with stage_timer("validation"):
+        doc = create_document(from_api_data=form_data)
+        doc.validate()
 
-        section_category = section["category"]
-        section_title = section["title"]
+    with stage_timer("constraints"):
+        doc.load_hard_constraints(HARD_CONSTRAINTS_PATH)
+        doc.apply_hard_constraints()
 
-        # SECTION-AWARE RETRIEVAL
-        relevant_snippets = retrieve_relevant_chunks_for_section(
-            compliance_requirements,
-            section_category=section_category,
-            section_title=section_title,
-            top_k=6,
-            always_include_baseline=True,
-            min_score=15
-        )
+    return doc
 
-        # ✅ Mandatory clauses for this section
-        required_clauses = _select_required_clauses_for_section(
-            compliance_requirements,
-            section_category=section_category
-        )
 
-        # Build Payload (now includes required_clauses)
+def _prepare_document(form_data: dict) -> tuple[dict, dict]:
+    """
+    Validation + constraint evaluation (pure CPU, no I/O to the model).
+    Returns (promotion_context, compliance_requirements).
+    """
+    doc = _load_document(form_data)
+    return _build_promotion_context(doc), doc._constraint_output
+
+
+def compliance_report(form_data: dict) -> tuple[str, dict]:
+    """
+    Compliance report for a promotion as (text, JSON-ready dict).
+    Rendered in memory; nothing touches the filesystem.
+    """
+    doc = _load_document(form_data)
+    return doc.render_compliance_report(), doc.compliance_report()
+
+
+def _retrieve_all_sections(compliance_requirements: dict, retrieval_memo: dict | None = None) -> dict[str, list[dict]]:
+    """
+    SECTION-AWARE RETRIEVAL for every section in one pass over the KB.
+
+    `retrieval_memo` shares results between documents whose constraint
+    output retrieves the same thing (see retrieval.retrieval_key).
+    """
+    with stage_timer("retrieval"):
+        if retrieval_memo is None:
+            return _retrieve_sections(compliance_requirements)
+
+        memo_key = retrieval_key(compliance_requirements, SECTIONS)
+        snippets = retrieval_memo.get(memo_key)
+        if snippets is None:
+            snippets = _retrieve_sections(compliance_requirements)
+            retrieval_memo[memo_key] = snippets
+        return snippets
+
+
+def _retrieve_sections(compliance_requirements: dict) -> dict[str, list[dict]]:
+    return retrieve_for_sections(
+        compliance_requirements,
+        SECTIONS,
+        top_k=6,
+        always_include_baseline=True,
+        min_score=15
+    )
+
+
+def _prepare_section(
+    section: dict,
+    promotion_context: dict,
+    compliance_requirements: dict,
+    relevant_snippets: list[dict],
+) -> tuple[dict, list[dict]]:
+    """
+    Payload building for ONE section from its retrieved snippets.
+    Returns (payload, required_clauses).
+    """
+    section_category = section["category"]
+    section_title = section["title"]
+
+    # ✅ Mandatory clauses for this section
+    required_clauses = _select_required_clauses_for_section(
+        compliance_requirements,
+        section_category=section_category
+    )
+
+    # Build Payload (now includes required_clauses)
+    with stage_timer("payload", section["id"]):
         payload = build_generation_payload(
             promotion_context=promotion_context,
             compliance_requirements=compliance_requirements,
@@ -150,55 +246,479 @@ def generate_official_rules(form_data: dict):
             section_category=section_category,
             required_clauses=required_clauses
         )
+    payload["section"] = section["id"]
+    PROMPT_TOKENS.observe(payload["prompt_tokens"], section=section["id"])
+
+    return payload, required_clauses
+
+
+def _section_validator(required_clauses: list[dict]):
+    """
+    Validator for a first draft: rejects it if the model stopped on a
+    length limit or finished without a mandatory clause.
+    """
+    def validate(section_text: str, stopped_on_length: bool) -> bool:
+        return not (
+            stopped_on_length
+            or _looks_truncated(section_text)
+            or _missing_required_clauses(section_text, required_clauses)
+        )
+    return validate
+
+
+def _section_check(required_clauses: list[dict]):
+    """
+    Check on the streamed draft: a mandatory clause that was started and
+    then reworded can't pass enforcement, so the stream is cancelled and
+    the correction retry goes out right away.
+    """
+    if not required_clauses:
+        return None
+
+    def check(partial_text: str) -> bool:
+        return not _diverged_clauses(partial_text, required_clauses)
+    return check
+
+
+def _correction_payload(
+    payload: dict,
+    section_text: str,
+    required_clauses: list[dict],
+    stopped_on_length: bool = False,
+) -> dict | None:
+    """
+    Retry payload if the first draft failed enforcement, else None.
+    """
+    missing = _missing_required_clauses(section_text, required_clauses)
+    truncated = stopped_on_length or _looks_truncated(section_text)
+
+    if not (missing or truncated):
+        return None
+
+    extra = "\n\nCORRECTION REQUIRED:\n"
+
+    if missing:
+        extra += "You omitted mandatory clause(s). You MUST include each clause EXACTLY as written:\n"
+        for c in missing:
+            extra += f"- [{c['id']}] {c['text']}\n"
+
+    if truncated:
+        extra += "Your section appears cut off. You MUST provide a complete section ending with a full sentence.\n"
 
+    retry = dict(payload, prompt=payload["prompt"] + extra)
+    if stopped_on_length:
+        # Room for the complete section this time
+        retry["max_output_tokens"] = 2 * (payload.get("max_output_tokens") or OPENAI_MAX_OUTPUT_TOKENS)
 
-        # ---- Generate with 1 retry if enforcement fails ----
-        section_text = generate_text(payload)
+    # Same prefix as the first attempt, so it stays cacheable
+    return retry
 
-        missing = _missing_required_clauses(section_text, required_clauses)
-        truncated = _looks_truncated(section_text)
 
-        # Retry once if needed
-        if missing or truncated:
-            extra = "\n\nCORRECTION REQUIRED:\n"
+def _enforce_required_clauses(section_text: str, required_clauses: list[dict], section_id: str) -> str:
+    # 🔒 FAIL-CLOSED ENFORCEMENT (Deterministic Append)
+    final_missing = _missing_required_clauses(section_text, required_clauses)
 
-            if missing:
-                extra += "You omitted mandatory clause(s). You MUST include each clause EXACTLY as written:\n"
-                for c in missing:
-                    extra += f"- [{c['id']}] {c['text']}\n"
+    if final_missing:
+        for c in final_missing:
+            # Append clause directly if model failed to include it
+            section_text += f"\n\n{c['text']}\n"
+            CLAUSE_APPENDS.inc(section=section_id, clause=c["id"])
 
-            if truncated:
-                extra += "Your section appears cut off. You MUST provide a complete section ending with a full sentence.\n"
+    return section_text
 
-            payload_retry = {"prompt": payload["prompt"] + extra}
-            section_text = generate_text(payload_retry)
 
-        # 🔒 FAIL-CLOSED ENFORCEMENT (Deterministic Append)
-        final_missing = _missing_required_clauses(section_text, required_clauses)
+def _count_llm_error(exc: GenerationError, section_id: str) -> None:
+    LLM_ERRORS.inc(section=section_id, kind="rate_limited" if exc.rate_limited else "api")
 
-        if final_missing:
-            for c in final_missing:
-                # Append clause directly if model failed to include it
-                section_text += f"\n\n{c['text']}\n"
-        generated_sections[section["id"]] = section_text
 
+async def _generate_timed_async(payload: dict, stage: str, section_id: str, validate=None, check=None) -> str:
+    with stage_timer(stage, section_id):
+        try:
+            return await generate_text_async(payload, validate, check)
+        except GenerationError as e:
+            _count_llm_error(e, section_id)
+            raise
 
 
+async def _draft_async(payload: dict, required_clauses: list[dict], section_id: str) -> str:
+    # ---- Generate with 1 retry if enforcement fails ----
+    # (a reworded clause cancels the stream, so the retry is issued mid-draft)
+    try:
+        return await _generate_timed_async(
+            payload, "llm_first", section_id, _section_validator(required_clauses), _section_check(required_clauses)
+        )
+    except OutputRejected as rejected:
+        SECTION_RETRIES.inc(section=section_id)
+        payload_retry = _correction_payload(payload, rejected.text, required_clauses, rejected.stopped_on_length)
+        return await _generate_timed_async(payload_retry, "llm_retry", section_id)
+
+
+def _render_template(
+    spec: SectionTemplate,
+    section: dict,
+    promotion_context: dict,
+    compliance_requirements: dict,
+    fill_in: str = "",
+) -> str:
+    required_clauses = _select_required_clauses_for_section(compliance_requirements, section["category"])
+    with stage_timer("template", section["id"]):
+        text = render_section(spec, promotion_context, compliance_requirements, required_clauses, fill_in)
+    return _enforce_required_clauses(text, required_clauses, section["id"])
+
+
+async def _generate_section_async(
+    section: dict,
+    promotion_context: dict,
+    compliance_requirements: dict,
+    relevant_snippets: list[dict],
+) -> str:
+    """
+    Build -> generate -> enforce pipeline for ONE section (retrieval is
+    done up front for all sections). Only reads shared inputs, so it is
+    safe to run several sections at once. Model calls are awaited, payload
+    building runs in a worker thread.
+    """
+    spec = get_section_template(section["id"])
+    if spec is not None and spec.mode == TEMPLATE:
+        return _render_template(spec, section, promotion_context, compliance_requirements)
 
+    payload, required_clauses = await asyncio.to_thread(
+        _prepare_section, section, promotion_context, compliance_requirements, relevant_snippets
+    )
 
-    # Build docx in memory
-    document = Document()
-    document.add_heading("OFFICIAL SWEEPSTAKES RULES", level=1)
+    if spec is not None:
+        # Hybrid: the skeleton carries the mandatory clauses, the model only fills the slot
+        fill_in = await _draft_async(fill_in_payload(spec, payload), [], section["id"])
+        return _render_template(spec, section, promotion_context, compliance_requirements, fill_in)
 
-    for section in SECTIONS:
-        document.add_heading(section["title"], level=2)
-        content = generated_sections.get(section["id"], "")
+    section_text = await _draft_async(payload, required_clauses, section["id"])
+    return _enforce_required_clauses(section_text, required_clauses, section["id"])
 
-        for line in content.split("\n"):
-            document.add_paragraph(line)
 
+def _build_docx(generated_sections: dict[str, str]) -> BytesIO:
+    # Build docx in memory (same writer as the streaming path)
     buffer = BytesIO()
-    document.save(buffer)
+    with stage_timer("docx_save"):
+        stream = DocxStream()
+        buffer.write(stream.begin())
+        for section in SECTIONS:
+            buffer.write(stream.add_section(section["title"], generated_sections.get(section["id"], "")))
+        buffer.write(stream.finish())
     buffer.seek(0)
 
-    return buffer
\ No newline at end of file
+    return buffer
+
+
+def _concurrency(max_concurrency: int | None) -> int:
+    return max(1, min(max_concurrency or SECTION_CONCURRENCY, len(SECTIONS)))
+
+
+async def _gather_or_cancel(coros) -> list:
+    """
+    gather() that fails fast: a failing task cancels the others (no more
+    model calls for a document that already failed), and its exception is
+    re-raised as is once they have unwound.
+    """
+    tasks = [asyncio.create_task(coro) for coro in coros]
+    try:
+        await asyncio.wait(tasks, return_when=asyncio.FIRST_EXCEPTION)
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    for task in tasks:
+        if not task.cancelled() and task.exception() is not None:
+            raise task.exception()
+    return [task.result() for task in tasks]
+
+
+def generate_official_rules(form_data: dict, max_concurrency: int | None = None):
+    """
+    Blocking entry point for scripts; runs generate_official_rules_async
+    on a fresh event loop (so it can't be called from inside one).
+    """
+    return asyncio.run(generate_official_rules_async(form_data, max_concurrency))
+
+
+async def generate_official_rules_async(
+    form_data: dict,
+    max_concurrency: int | None = None,
+    *,
+    semaphore: asyncio.Semaphore | None = None,
+    retrieval_memo: dict | None = None,
+    completed_sections: dict[str, str] | None = None,
+    on_section_done=None,
+    prepared: tuple[dict, dict] | None = None,
+):
+    """
+    Generate the .docx for one promotion, sections concurrently.
+    CPU-bound steps (constraint evaluation, docx build) are offloaded to threads.
+
+    A batch passes its own `semaphore` (global LLM budget) and a shared
+    `retrieval_memo`. The job queue and drafts reuse earlier work through
+    `completed_sections` ({section id: text}, not regenerated) and are told
+    about each newly finished section via `await on_section_done(id, text)`.
+    Callers that already ran _prepare_document pass its result as `prepared`.
+    """
+    completed_sections = completed_sections or {}
+
+    if prepared is None:
+        prepared = await asyncio.to_thread(_prepare_document, form_data)
+    promotion_context, compliance_requirements = prepared
+    snippets = await asyncio.to_thread(_retrieve_all_sections, compliance_requirements, retrieval_memo)
+
+    if semaphore is None:
+        semaphore = asyncio.Semaphore(_concurrency(max_concurrency))
+
+    async def run(section: dict) -> str:
+        if section["id"] in completed_sections:
+            return completed_sections[section["id"]]
+        async with semaphore:
+            text = await _generate_section_async(
+                section, promotion_context, compliance_requirements, snippets[section["id"]]
+            )
+        if on_section_done is not None:
+            await on_section_done(section["id"], text)
+        return text
+
+    # Results come back in SECTIONS order -> same document as the serial path
+    texts = await _gather_or_cancel(run(section) for section in SECTIONS)
+    generated_sections = {section["id"]: text for section, text in zip(SECTIONS, texts)}
+
+    return await asyncio.to_thread(_build_docx, generated_sections)
+
+
+async def stream_official_rules_async(form_data: dict, max_concurrency: int | None = None):
+    """
+    Async generator of .docx bytes. Static template parts go out as soon
+    as validation and retrieval are done; each section is rendered and
+    sent once it and every section before it have finished.
+
+    A model failure raises out of the generator after earlier chunks were
+    yielded; a caller that already sent them must abort the response
+    rather than end it normally (the API lets the exception break the
+    chunked transfer). Close the generator (aclose) to cancel outstanding
+    section calls.
+    """
+    promotion_context, compliance_requirements = await asyncio.to_thread(_prepare_document, form_data)
+    snippets = await asyncio.to_thread(_retrieve_all_sections, compliance_requirements)
+
+    semaphore = asyncio.Semaphore(_concurrency(max_concurrency))
+
+    async def run(section: dict) -> str:
+        async with semaphore:
+            return await _generate_section_async(
+                section, promotion_context, compliance_requirements, snippets[section["id"]]
+            )
+
+    tasks = [asyncio.create_task(run(section)) for section in SECTIONS]
+    try:
+        stream = DocxStream()
+        yield stream.begin()
+
+        for section, task in zip(SECTIONS, tasks):
+            text = await task
+            with stage_timer("docx_render", section["id"]):
+                chunk = stream.add_section(section["title"], text)
+            if chunk:
+                yield chunk
+
+        yield stream.finish()
+    finally:
+        # Client went away or a section failed: stop the remaining calls and
+        # wait for them to unwind (limiter reservations, cache writes)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
+# -------------------------------------------------------------------
+# Warm-up: pay the first request's one-time costs before serving
+# -------------------------------------------------------------------
+def warm_up() -> dict[str, float]:
+    """
+    Load the compiled constraints, the KB (and its index), the docx
+    template and the OpenAI SDK/sync client. Blocking; returns seconds
+    spent per step.
+    """
+    steps = (
+        ("constraints", lambda: get_compiled_constraints(HARD_CONSTRAINTS_PATH)),
+        ("knowledge_base", preload_knowledge_base),
+        ("docx_template", get_docx_template),
+        ("llm_client", get_client),
+    )
+    timings = {}
+    for name, step in steps:
+        started = time.perf_counter()
+        step()
+        timings[name] = round(time.perf_counter() - started, 4)
+    return timings
+
+
+async def warm_up_async() -> dict[str, float]:
+    """
+    warm_up() off the event loop, then this loop's async client.
+    """
+    timings = await asyncio.to_thread(warm_up)
+    started = time.perf_counter()
+    get_async_client()
+    timings["llm_async_client"] = round(time.perf_counter() - started, 4)
+    return timings
+
+
+# -------------------------------------------------------------------
+# Drafts: stored sections, partial regeneration after a field patch
+# -------------------------------------------------------------------
+async def create_draft_async(form_data: dict) -> tuple[Draft, BytesIO]:
+    """
+    Generate every section and keep them server-side as a new draft.
+    """
+    prepared = await asyncio.to_thread(_prepare_document, form_data)
+    sections: dict[str, str] = {}
+
+    async def keep(section_id: str, text: str) -> None:
+        sections[section_id] = text
+
+    buffer = await generate_official_rules_async(form_data, on_section_done=keep, prepared=prepared)
+
+    store = get_draft_store()
+    draft_id = await asyncio.to_thread(store.create, form_data, *prepared, sections)
+    return await asyncio.to_thread(store.get, draft_id), buffer
+
+
+async def revise_draft_async(draft: Draft, form_data: dict) -> tuple[Draft, list[str], BytesIO]:
+    """
+    Regenerate a draft for an edited form (see drafts.merge_patch), but
+    only the sections whose inputs changed. Returns (new revision,
+    regenerated section ids, .docx). Raises DraftConflict if the draft
+    moved on meanwhile.
+    """
+    prepared = await asyncio.to_thread(_prepare_document, form_data)
+
+    stale = affected_sections(draft.promotion_context, prepared[0], draft.compliance_requirements, prepared[1])
+    kept = {section_id: text for section_id, text in draft.sections.items() if section_id not in stale}
+    sections = dict(kept)
+
+    async def keep(section_id: str, text: str) -> None:
+        sections[section_id] = text
+
+    buffer = await generate_official_rules_async(
+        form_data, completed_sections=kept, on_section_done=keep, prepared=prepared
+    )
+
+    store = get_draft_store()
+    await asyncio.to_thread(store.update, draft.id, draft.version, form_data, *prepared, sections)
+    regenerated = [section["id"] for section in SECTIONS if section["id"] not in kept]
+    return await asyncio.to_thread(store.get, draft.id), regenerated, buffer
+
+
+def build_draft_docx(draft: Draft) -> BytesIO:
+    # Stored text only; no model calls
+    return _build_docx(draft.sections)
+
+
+# -------------------------------------------------------------------
+# Document + compliance report bundle
+# -------------------------------------------------------------------
+def _build_bundle_zip(docx: BytesIO, report_text: str, report: dict) -> BytesIO:
+    archive = BytesIO()
+    with zipfile.ZipFile(archive, "w", compression=zipfile.ZIP_DEFLATED) as zf:
+        zf.writestr("official_rules.docx", docx.getvalue())
+        zf.writestr("compliance_report.txt", report_text)
+        zf.writestr("compliance_report.json", json.dumps(report, indent=2))
+    archive.seek(0)
+    return archive
+
+
+def _prepare_bundle(form_data: dict) -> tuple[tuple[dict, dict], str, dict]:
+    """
+    _prepare_document and compliance_report from a single evaluation.
+    Returns ((promotion_context, compliance_requirements), report text, report).
+    """
+    doc = _load_document(form_data)
+    prepared = (_build_promotion_context(doc), doc._constraint_output)
+    return prepared, doc.render_compliance_report(), doc.compliance_report()
+
+
+async def generate_official_rules_bundle_async(form_data: dict, max_concurrency: int | None = None) -> BytesIO:
+    """
+    Zip of the .docx plus the compliance report in text and JSON form.
+    """
+    # Validation / constraints run once and feed both the report and the document
+    prepared, report_text, report = await asyncio.to_thread(_prepare_bundle, form_data)
+    docx = await generate_official_rules_async(form_data, max_concurrency, prepared=prepared)
+    return await asyncio.to_thread(_build_bundle_zip, docx, report_text, report)
+
+
+# -------------------------------------------------------------------
+# Batch generation
+# -------------------------------------------------------------------
+BATCH_LLM_CONCURRENCY = int(os.getenv("BATCH_LLM_CONCURRENCY", "8"))
+
+
+def _batch_filename(index: int, name: str) -> str:
+    safe_name = re.sub(r"[^A-Za-z0-9_-]+", "_", (name or "").strip()).strip("_") or "promotion"
+    return f"{index:03d}_{safe_name}_Official_Rules.docx"
+
+
+def _build_batch_zip(results: list[dict], buffers: list[BytesIO | None]) -> BytesIO:
+    archive = BytesIO()
+    with zipfile.ZipFile(archive, "w", compression=zipfile.ZIP_DEFLATED) as zf:
+        for result, buffer in zip(results, buffers):
+            if buffer is not None:
+                zf.writestr(result["file"], buffer.getvalue())
+        zf.writestr("manifest.json", json.dumps({"items": results}, indent=2))
+    archive.seek(0)
+    return archive
+
+
+async def generate_official_rules_batch_async(
+    items: list[dict],
+    max_llm_concurrency: int | None = None,
+) -> BytesIO:
+    """
+    Generate many Official Rules documents under ONE global LLM concurrency
+    budget. Constraints and the KB come from their process-wide caches,
+    and retrieval results are memoized across items.
+
+    Returns a zip with one .docx per successful item plus manifest.json.
+    A failing item is recorded in the manifest; the others still complete.
+    """
+    semaphore = asyncio.Semaphore(max(1, max_llm_concurrency or BATCH_LLM_CONCURRENCY))
+    retrieval_memo: dict = {}
+
+    async def run(form_data: dict) -> BytesIO:
+        return await generate_official_rules_async(
+            form_data,
+            semaphore=semaphore,
+            retrieval_memo=retrieval_memo,
+        )
+
+    outcomes = await asyncio.gather(
+        *(run(item) for item in items),
+        return_exceptions=True,
+    )
+
+    results: list[dict] = []
+    buffers: list[BytesIO | None] = []
+    for index, (item, outcome) in enumerate(zip(items, outcomes), start=1):
+        entry = {"index": index, "name": item.get("name")}
+        if isinstance(outcome, (ValueError, KeyError, GenerationError)):
+            entry.update({"status": "error", "file": None, "error": str(outcome)})
+            buffers.append(None)
+        elif isinstance(outcome, Exception):
+            # Infrastructure failures (cache/limiter DB, I/O) also stay per-item,
+            # so the documents that did finish are still returned
+            logger.error("Batch item %d failed", index, exc_info=outcome)
+            entry.update({"status": "error", "file": None, "error": f"Unexpected error: {type(outcome).__name__}: {outcome}"})
+            buffers.append(None)
+        elif isinstance(outcome, BaseException):
+            # Cancellation (client went away, shutdown) aborts the batch
+            raise outcome
+        else:
+            entry.update({"status": "ok", "file": _batch_filename(index, item.get("name")), "error": None})
+            buffers.append(outcome)
+        results.append(entry)
+
+    return await asyncio.to_thread(_build_batch_zip, results, buffers)
@@ -0,0 +1,159 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+
+# -------------------------------------------------------------------
+# Persistent, content-addressed cache for generated section text.
+#
+# Key   = sha256(prompt, system prompt, model, temperature)
+# Store = local SQLite file, bounded by total bytes (LRU) and TTL
+# -------------------------------------------------------------------
+GENERATION_CACHE_ENABLED = os.getenv("GENERATION_CACHE", "1") not in ("0", "false", "False", "")
+GENERATION_CACHE_PATH = os.getenv("GENERATION_CACHE_PATH", ".generation_cache.sqlite3")
+GENERATION_CACHE_MAX_BYTES = int(os.getenv("GENERATION_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+GENERATION_CACHE_TTL = float(os.getenv("GENERATION_CACHE_TTL", str(7 * 24 * 3600)))
+
+
+def cache_key(prompt: str, system_prompt: str, model: str, temperature: float) -> str:
+    material = json.dumps([prompt, system_prompt, model, temperature], ensure_ascii=False)
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+
+class SectionCache:
+    def __init__(self, path: str, max_bytes: int, ttl_seconds: float):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "writes": 0, "evictions": 0, "expired": 0}
+        self._initialized = False
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=30)
+        if not self._initialized:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS sections (
+                    key      TEXT PRIMARY KEY,
+                    value    TEXT NOT NULL,
+                    size     INTEGER NOT NULL,
+                    created  REAL NOT NULL,
+                    accessed REAL NOT NULL
+                )
+                """
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS sections_accessed ON sections (accessed)")
+            conn.commit()
+            self._initialized = True
+        return conn
+
+    def _count(self, name: str, n: int = 1) -> None:
+        with self._lock:
+            self._stats[name] += n
+
+    def get(self, key: str) -> str | None:
+        now = time.time()
+        conn = self._connect()
+        try:
+            with conn:
+                row = conn.execute(
+                    "SELECT value, created FROM sections WHERE key = ?", (key,)
+                ).fetchone()
+
+                if row is None:
+                    self._count("misses")
+                    return None
+
+                value, created = row
+                if now - created > self.ttl_seconds:
+                    conn.execute("DELETE FROM sections WHERE key = ?", (key,))
+                    self._count("expired")
+                    self._count("misses")
+                    return None
+
+                conn.execute("UPDATE sections SET accessed = ? WHERE key = ?", (now, key))
+        finally:
+            conn.close()
+
+        self._count("hits")
+        return value
+
+    def put(self, key: str, value: str) -> None:
+        now = time.time()
+        size = len(value.encode("utf-8"))
+        if size > self.max_bytes:
+            return
+
+        conn = self._connect()
+        try:
+            with conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO sections (key, value, size, created, accessed) VALUES (?, ?, ?, ?, ?)",
+                    (key, value, size, now, now),
+                )
+                expired = conn.execute(
+                    "DELETE FROM sections WHERE created < ?", (now - self.ttl_seconds,)
+                ).rowcount
+                evicted = self._evict(conn)
+        finally:
+            conn.close()
+
+        self._count("writes")
+        self._count("expired", expired)
+        self._count("evictions", evicted)
+
+    def _evict(self, conn: sqlite3.Connection) -> int:
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM sections").fetchone()[0]
+        if total <= self.max_bytes:
+            return 0
+
+        evicted = 0
+        # Least recently used first
+        for key, size in conn.execute("SELECT key, size FROM sections ORDER BY accessed ASC").fetchall():
+            if total <= self.max_bytes:
+                break
+            conn.execute("DELETE FROM sections WHERE key = ?", (key,))
+            total -= size
+            evicted += 1
+        return evicted
+
+    def clear(self) -> None:
+        conn = self._connect()
+        try:
+            with conn:
+                conn.execute("DELETE FROM sections")
+        finally:
+            conn.close()
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = dict(self._stats)
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = (stats["hits"] / lookups) if lookups else 0.0
+        return stats
+
+
+_cache: SectionCache | None = None
+_cache_lock = threading.Lock()
+
+
+def get_section_cache() -> SectionCache | None:
+    """
+    Process-wide cache instance, or None when GENERATION_CACHE=0.
+    """
+    global _cache
+    if not GENERATION_CACHE_ENABLED:
+        return None
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = SectionCache(
+                    GENERATION_CACHE_PATH,
+                    max_bytes=GENERATION_CACHE_MAX_BYTES,
+                    ttl_seconds=GENERATION_CACHE_TTL,
+                )
+    return _cache
@@ -1,47 +1,458 @@
 import os
-from openai import OpenAI
-from openai import RateLimitError, APIError
+import time
+import random
+import asyncio
+import threading
+import weakref
+from types import SimpleNamespace
+from typing import TYPE_CHECKING, Callable
+from email.utils import parsedate_to_datetime
+
 from generation.prompts import SYSTEM_PROMPT
+from generation.cache import cache_key, get_section_cache
+from generation.rate_limit import RateLimitTimeout, estimate_tokens, get_rate_limiter
+from generation.tokens import count_tokens
+from metrics import LLM_INPUT_TOKENS, LLM_CACHED_INPUT_TOKENS, LLM_OUTPUT_TOKENS, DOCUMENT
+
+# openai/httpx take ~0.5s to import: they are loaded with the first client
+# (or by warm-up), not when this module is imported
+if TYPE_CHECKING:
+    import httpx
+    from openai import OpenAI, AsyncOpenAI
 
 MODEL_NAME = os.getenv("OPENAI_MODEL", "gpt-4.1")
+TEMPERATURE = 0.2
+
+# -------------------------------------------------------------------
+# Client / retry configuration
+# -------------------------------------------------------------------
+OPENAI_MAX_CONNECTIONS = int(os.getenv("OPENAI_MAX_CONNECTIONS", "100"))
+OPENAI_MAX_KEEPALIVE = int(os.getenv("OPENAI_MAX_KEEPALIVE", "20"))
+OPENAI_TIMEOUT = float(os.getenv("OPENAI_TIMEOUT", "120"))
+OPENAI_CONNECT_TIMEOUT = float(os.getenv("OPENAI_CONNECT_TIMEOUT", "10"))
+
+OPENAI_MAX_RETRIES = int(os.getenv("OPENAI_MAX_RETRIES", "4"))
+OPENAI_BACKOFF_BASE = float(os.getenv("OPENAI_BACKOFF_BASE", "1.0"))
+OPENAI_BACKOFF_MAX = float(os.getenv("OPENAI_BACKOFF_MAX", "30"))
+
+# Stream responses so a `check` can cancel a bad draft before it is finished
+OPENAI_STREAMING = os.getenv("OPENAI_STREAMING", "1") not in ("0", "false", "False", "")
+
+# Output budget per call (a payload's own "max_output_tokens" wins); hitting
+# it ends the response as incomplete, which validators see as a length stop
+OPENAI_MAX_OUTPUT_TOKENS = int(os.getenv("OPENAI_MAX_OUTPUT_TOKENS", "2048"))
+
+# validate(text, stopped_on_length) -> True to accept the finished draft
+Validator = Callable[[str, bool], bool]
 
+# check(text so far) -> False to cancel the stream and reject the draft early.
+# Called whenever a streamed delta closes a sentence or a line.
+PartialCheck = Callable[[str], bool]
 
-def generate_text(payload: dict) -> str:
+
+class GenerationError(RuntimeError):
     """
-    Sends a structured drafting prompt to OpenAI and returns the generated section text.
+    Raised when the model call fails for good (non-retryable error, or
+    retries exhausted). Never written into the document.
+    """
+
+    def __init__(self, message: str, *, attempts: int, rate_limited: bool = False):
+        super().__init__(message)
+        self.attempts = attempts
+        self.rate_limited = rate_limited
+
+
+class OutputRejected(Exception):
     """
+    The model answered, but the caller's validator rejected the draft.
+    Carries the draft so the caller can build a correction prompt.
+    """
+
+    def __init__(self, text: str, *, stopped_on_length: bool = False):
+        super().__init__("Generated text rejected by validator")
+        self.text = text
+        self.stopped_on_length = stopped_on_length
+
+
+# -------------------------------------------------------------------
+# Shared clients (keep-alive + TLS sessions reused across calls)
+# -------------------------------------------------------------------
+_client: "OpenAI | None" = None
+_client_lock = threading.Lock()
+_async_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, AsyncOpenAI]" = weakref.WeakKeyDictionary()
+
+
+def _limits() -> "httpx.Limits":
+    import httpx
+
+    return httpx.Limits(
+        max_connections=OPENAI_MAX_CONNECTIONS,
+        max_keepalive_connections=OPENAI_MAX_KEEPALIVE,
+    )
+
+
+def _timeout() -> "httpx.Timeout":
+    import httpx
+
+    return httpx.Timeout(OPENAI_TIMEOUT, connect=OPENAI_CONNECT_TIMEOUT)
+
+
+def get_client() -> "OpenAI":
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                from openai import OpenAI, DefaultHttpxClient
 
-    # 🔥 Create client INSIDE the function
-    client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+                _client = OpenAI(
+                    api_key=os.getenv("OPENAI_API_KEY"),
+                    # Retries are handled here so Retry-After + jitter are applied uniformly
+                    max_retries=0,
+                    timeout=_timeout(),
+                    http_client=DefaultHttpxClient(limits=_limits(), timeout=_timeout()),
+                )
+    return _client
 
+
+def get_async_client() -> "AsyncOpenAI":
+    """
+    One async client per event loop (httpx async pools can't cross loops).
+    """
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None:
+        from openai import AsyncOpenAI, DefaultAsyncHttpxClient
+
+        client = AsyncOpenAI(
+            api_key=os.getenv("OPENAI_API_KEY"),
+            max_retries=0,
+            timeout=_timeout(),
+            http_client=DefaultAsyncHttpxClient(limits=_limits(), timeout=_timeout()),
+        )
+        _async_clients[loop] = client
+    return client
+
+
+async def close_async_client() -> None:
+    loop = asyncio.get_running_loop()
+    client = _async_clients.pop(loop, None)
+    if client is not None:
+        await client.close()
+
+
+# -------------------------------------------------------------------
+# Retry policy
+# -------------------------------------------------------------------
+def _is_retryable(exc: Exception) -> bool:
+    import httpx
+    from openai import RateLimitError, APIConnectionError, InternalServerError
+
+    # httpx transport errors can surface mid-stream, outside the SDK's wrapping
+    return isinstance(exc, (RateLimitError, APIConnectionError, InternalServerError, httpx.TransportError))
+
+
+def _retry_after_seconds(exc: Exception) -> float | None:
+    response = getattr(exc, "response", None)
+    if response is None:
+        return None
+
+    headers = response.headers
+    retry_after_ms = headers.get("retry-after-ms")
+    if retry_after_ms:
+        try:
+            return float(retry_after_ms) / 1000.0
+        except ValueError:
+            pass
+
+    retry_after = headers.get("retry-after")
+    if not retry_after:
+        return None
+    try:
+        return float(retry_after)
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(retry_after).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def _backoff_delay(attempt: int, exc: Exception) -> float:
+    """
+    Full-jitter exponential backoff; a server-provided Retry-After wins
+    as the lower bound.
+    """
+    delay = random.uniform(0, min(OPENAI_BACKOFF_MAX, OPENAI_BACKOFF_BASE * (2 ** attempt)))
+    retry_after = _retry_after_seconds(exc)
+    if retry_after is not None:
+        delay = max(delay, min(retry_after, OPENAI_BACKOFF_MAX))
+    return delay
+
+
+def _final_error(exc: Exception, attempts: int) -> GenerationError:
+    from openai import RateLimitError, APIError, APIStatusError
+
+    if isinstance(exc, GenerationError):
+        return exc
+    if isinstance(exc, RateLimitTimeout):
+        return GenerationError(f"Rate limit queue full: {exc}", attempts=attempts, rate_limited=True)
+    if isinstance(exc, RateLimitError):
+        return GenerationError(
+            f"OpenAI rate limit exceeded after {attempts} attempt(s)",
+            attempts=attempts,
+            rate_limited=True,
+        )
+    if isinstance(exc, APIStatusError):
+        return GenerationError(
+            f"OpenAI API error {exc.status_code} after {attempts} attempt(s): {exc.message}",
+            attempts=attempts,
+        )
+    if isinstance(exc, APIError):
+        return GenerationError(f"OpenAI API error after {attempts} attempt(s): {exc}", attempts=attempts)
+    return GenerationError(f"Unexpected generation error: {exc}", attempts=attempts)
+
+
+# -------------------------------------------------------------------
+# Generation
+# -------------------------------------------------------------------
+def _prompt_text(payload: dict) -> str:
     prompt_text = payload.get("prompt")
 
     if not prompt_text:
         raise ValueError("Payload missing 'prompt' field for generation.")
 
-    try:
-        response = client.responses.create(
-            model=MODEL_NAME,
-            input=[
-                {
-                    "role": "system",
-                    "content": SYSTEM_PROMPT
-                },
-                {
-                    "role": "user",
-                    "content": prompt_text
-                }
-            ],
-            temperature=0.2,
-        )
+    return prompt_text
+
+
+def _request_kwargs(payload: dict, prompt_text: str) -> dict:
+    kwargs = {
+        "model": MODEL_NAME,
+        "input": [
+            {
+                "role": "system",
+                "content": SYSTEM_PROMPT
+            },
+            {
+                "role": "user",
+                "content": prompt_text
+            }
+        ],
+        "temperature": TEMPERATURE,
+        "max_output_tokens": payload.get("max_output_tokens") or OPENAI_MAX_OUTPUT_TOKENS,
+    }
+    if payload.get("prompt_cache_key"):
+        kwargs["prompt_cache_key"] = payload["prompt_cache_key"]
+    return kwargs
+
+
+def _record_usage(payload: dict, usage) -> None:
+    """
+    Per-section token accounting from the response usage (cached input
+    tokens show how much of the prompt prefix the provider reused).
+    """
+    if usage is None:
+        return
+    section = payload.get("section", DOCUMENT)
+    details = getattr(usage, "input_tokens_details", None)
+    LLM_INPUT_TOKENS.inc(usage.input_tokens or 0, section=section)
+    LLM_CACHED_INPUT_TOKENS.inc(getattr(details, "cached_tokens", 0) or 0, section=section)
+    LLM_OUTPUT_TOKENS.inc(usage.output_tokens or 0, section=section)
+
+
+def _estimated_usage(prompt_text: str, text: str) -> SimpleNamespace:
+    # A stream closed before response.completed carries no usage; the
+    # tokens up to that point are billed all the same
+    return SimpleNamespace(
+        input_tokens=count_tokens(SYSTEM_PROMPT) + count_tokens(prompt_text),
+        input_tokens_details=None,
+        output_tokens=count_tokens(text),
+    )
+
+
+def _accepts(validate: Validator | None, text: str, stopped_on_length: bool) -> bool:
+    return validate is None or validate(text, stopped_on_length)
+
+
+def _stream_failed(event) -> GenerationError:
+    error = getattr(event.response, "error", None)
+    return GenerationError(f"OpenAI response failed: {getattr(error, 'message', None) or 'unknown error'}", attempts=1)
+
+
+def _read_event(
+    event,
+    parts: list[str],
+    validate: Validator | None,
+    check: PartialCheck | None,
+) -> tuple[str, bool, bool, object] | None:
+    """
+    Handle one stream event. Returns (text, stopped_on_length, accepted,
+    usage) once the response has finished or `check` rejected the draft
+    so far, else None.
+    """
+    if event.type == "response.output_text.delta":
+        parts.append(event.delta)
+        if check is not None and ("." in event.delta or "\n" in event.delta):
+            text = "".join(parts)
+            if not check(text):
+                return text.strip(), False, False, None
+    elif event.type == "response.incomplete":
+        text = "".join(parts).strip()
+        reason = getattr(event.response.incomplete_details, "reason", None)
+        stopped = reason == "max_output_tokens"
+        return text, stopped, _accepts(validate, text, stopped), event.response.usage
+    elif event.type == "response.completed":
+        text = "".join(parts).strip()
+        return text, False, _accepts(validate, text, False), event.response.usage
+    elif event.type == "response.failed":
+        raise _stream_failed(event)
+    return None
+
+
+def _complete(
+    client: "OpenAI",
+    kwargs: dict,
+    validate: Validator | None,
+    check: PartialCheck | None,
+) -> tuple[str, bool, bool, object]:
+    """
+    One model call. Returns (text, stopped_on_length, accepted, usage);
+    usage is None if the stream was cut short.
+    """
+    if not OPENAI_STREAMING:
+        response = client.responses.create(**kwargs)
+        text = response.output_text.strip()
+        stopped = getattr(response.incomplete_details, "reason", None) == "max_output_tokens"
+        return text, stopped, _accepts(validate, text, stopped), response.usage
+
+    parts: list[str] = []
+    # Leaving the block closes the connection, which cancels the generation
+    with client.responses.create(**kwargs, stream=True) as stream:
+        for event in stream:
+            result = _read_event(event, parts, validate, check)
+            if result is not None:
+                return result
+
+    text = "".join(parts).strip()
+    return text, False, _accepts(validate, text, False), None
+
+
+async def _complete_async(
+    client: "AsyncOpenAI",
+    kwargs: dict,
+    validate: Validator | None,
+    check: PartialCheck | None,
+) -> tuple[str, bool, bool, object]:
+    if not OPENAI_STREAMING:
+        response = await client.responses.create(**kwargs)
+        text = response.output_text.strip()
+        stopped = getattr(response.incomplete_details, "reason", None) == "max_output_tokens"
+        return text, stopped, _accepts(validate, text, stopped), response.usage
+
+    parts: list[str] = []
+    async with await client.responses.create(**kwargs, stream=True) as stream:
+        async for event in stream:
+            result = _read_event(event, parts, validate, check)
+            if result is not None:
+                return result
+
+    text = "".join(parts).strip()
+    return text, False, _accepts(validate, text, False), None
+
+
+def generate_text(payload: dict, validate: Validator | None = None, check: PartialCheck | None = None) -> str:
+    """
+    Sends a structured drafting prompt to OpenAI and returns the generated section text.
+    Raises GenerationError if the call cannot be completed, and
+    OutputRejected if `validate` rejects the draft or `check` rejects it
+    while it streams (the request is cancelled at that point).
+    """
+    prompt_text = _prompt_text(payload)
+
+    # Content-addressed cache: identical prompts skip the model entirely
+    cache = get_section_cache()
+    key = cache_key(prompt_text, SYSTEM_PROMPT, MODEL_NAME, TEMPERATURE)
+    if cache is not None:
+        cached = cache.get(key)
+        if cached is not None:
+            if not _accepts(validate, cached, False):
+                raise OutputRejected(cached)
+            return cached
+
+    client = get_client()
+    kwargs = _request_kwargs(payload, prompt_text)
+    limiter = get_rate_limiter()
+    tokens = estimate_tokens(SYSTEM_PROMPT, prompt_text)
+
+    attempt = 0
+    while True:
+        try:
+            # Wait for a slot in the shared RPM/TPM budget (every attempt is a request)
+            if limiter is not None:
+                limiter.acquire(tokens)
+            text, stopped_on_length, accepted, usage = _complete(client, kwargs, validate, check)
+            break
+
+        except Exception as e:
+            if not _is_retryable(e) or attempt >= OPENAI_MAX_RETRIES:
+                raise _final_error(e, attempt + 1) from e
+            time.sleep(_backoff_delay(attempt, e))
+            attempt += 1
+
+    _record_usage(payload, usage or _estimated_usage(prompt_text, text))
+
+    # Only usable drafts are cached, so a retry after a rejection (or a
+    # length cut) goes back to the model instead of replaying the same text
+    if cache is not None and accepted and text and not stopped_on_length:
+        cache.put(key, text)
+    if not accepted:
+        raise OutputRejected(text, stopped_on_length=stopped_on_length)
+    return text
+
+
+async def generate_text_async(
+    payload: dict,
+    validate: Validator | None = None,
+    check: PartialCheck | None = None,
+) -> str:
+    """
+    Same as generate_text, but awaits the model call on the async client so
+    the event loop is free while the request is in flight.
+    """
+    prompt_text = _prompt_text(payload)
+
+    # Cache lookups hit local disk, so keep them off the event loop
+    cache = get_section_cache()
+    key = cache_key(prompt_text, SYSTEM_PROMPT, MODEL_NAME, TEMPERATURE)
+    if cache is not None:
+        cached = await asyncio.to_thread(cache.get, key)
+        if cached is not None:
+            if not _accepts(validate, cached, False):
+                raise OutputRejected(cached)
+            return cached
+
+    client = get_async_client()
+    kwargs = _request_kwargs(payload, prompt_text)
+    limiter = get_rate_limiter()
+    tokens = estimate_tokens(SYSTEM_PROMPT, prompt_text)
 
-        return response.output_text.strip()
+    attempt = 0
+    while True:
+        try:
+            if limiter is not None:
+                await limiter.acquire_async(tokens)
+            text, stopped_on_length, accepted, usage = await _complete_async(client, kwargs, validate, check)
+            break
 
-    except RateLimitError:
-        return "\n⚠️ API quota exceeded. Please check billing.\n"
+        except Exception as e:
+            if not _is_retryable(e) or attempt >= OPENAI_MAX_RETRIES:
+                raise _final_error(e, attempt + 1) from e
+            await asyncio.sleep(_backoff_delay(attempt, e))
+            attempt += 1
 
-    except APIError as e:
-        return f"\n⚠️ OpenAI API error: {str(e)}\n"
+    _record_usage(payload, usage or _estimated_usage(prompt_text, text))
 
-    except Exception as e:
-        return f"\n⚠️ Unexpected generation error: {str(e)}\n"
\ No newline at end of file
+    if cache is not None and accepted and text and not stopped_on_length:
+        await asyncio.to_thread(cache.put, key, text)
+    if not accepted:
+        raise OutputRejected(text, stopped_on_length=stopped_on_length)
+    return text
@@ -1,3 +1,73 @@
+import os
+import hashlib
+
+from generation.prompts import SYSTEM_PROMPT
+from generation.tokens import count_tokens, truncate_sentences
+
+# Per-section input budget (system + user prompt tokens); 0 = no packing
+PROMPT_TOKEN_BUDGET = int(os.getenv("PROMPT_TOKEN_BUDGET", "4000"))
+
+# "section_first": section instructions lead (original layout, default)
+# "shared_prefix": system prompt + facts + the promotion's foundational and
+#                  triggered rules form a prefix that is byte-identical for
+#                  every section of a promotion, so the provider can cache it.
+#                  Enable it only when trymark_llm_cached_input_tokens_total
+#                  shows cache hits for your traffic.
+PROMPT_LAYOUT = os.getenv("PROMPT_LAYOUT", "section_first")
+SECTION_FIRST = "section_first"
+SHARED_PREFIX = "shared_prefix"
+
+# Provider minimum for prompt caching; a shorter shared prefix can't be
+# cached, so the builder falls back to section_first instead of paying for
+# the longer prompt
+PROMPT_CACHE_MIN_TOKENS = int(os.getenv("PROMPT_CACHE_MIN_TOKENS", "1024"))
+
+# Don't bother keeping a snippet cut down to less than this
+MIN_SNIPPET_TOKENS = 40
+
+SNIPPET_SEPARATOR = "\n\n"
+
+
+def _format_snippet(s: dict) -> str:
+    return f"[Snippet ID: {s.get('id')} | Section: {s.get('section')}]\n{s.get('text')}"
+
+
+def pack_snippets(snippets: list[dict], budget: int | None) -> list[dict]:
+    """
+    Fill `budget` tokens with snippets, best retrieval `_score` per token
+    first. A snippet that doesn't fit whole is cut to its leading
+    sentences if enough room is left. Kept snippets stay in retrieval order.
+    """
+    if budget is None:
+        return list(snippets)
+
+    separator = count_tokens(SNIPPET_SEPARATOR)
+    candidates = []
+    for i, s in enumerate(snippets):
+        cost = count_tokens(_format_snippet(s)) + separator
+        value = max(float(s.get("_score") or 0), 1.0)
+        candidates.append((value / cost, i, cost))
+    candidates.sort(key=lambda c: (-c[0], c[1]))
+
+    remaining = budget
+    kept: dict[int, dict] = {}
+    for _, i, cost in candidates:
+        if cost <= remaining:
+            kept[i] = snippets[i]
+            remaining -= cost
+            continue
+
+        header = count_tokens(_format_snippet(dict(snippets[i], text=""))) + separator
+        if remaining - header < MIN_SNIPPET_TOKENS:
+            continue
+        text = truncate_sentences(snippets[i].get("text") or "", remaining - header)
+        if count_tokens(text) >= MIN_SNIPPET_TOKENS:
+            kept[i] = dict(snippets[i], text=text)
+            remaining -= header + count_tokens(text)
+
+    return [kept[i] for i in sorted(kept)]
+
+
 def build_generation_payload(
     promotion_context: dict,
     compliance_requirements: dict,
@@ -5,6 +75,8 @@ def build_generation_payload(
     section_name: str,
     section_category: str,
     required_clauses: list[dict] | None = None,
+    token_budget: int | None = None,
+    layout: str | None = None,
 ) -> dict:
 
     # ------------------------------------------------------------------
@@ -12,20 +84,23 @@ def build_generation_payload(
     #    + Prevent generic 50-state override if specific states exist
     # ------------------------------------------------------------------
     section_rules = []
+    # Rules that apply to this promotion (foundational + triggered), for the
+    # shared-prefix layout; conditional/untriggered ones must not read as applicable
+    all_rules = []
 
-    for group in compliance_requirements.values():
+    for group_name, group in compliance_requirements.items():
         for rule in group:
-            if rule["category"] != section_category:
-                continue
-
             if (
-                section_category == "eligibility"
+                rule["category"] == "eligibility"
                 and "50 United States" in rule["rule"]
                 and promotion_context.get("states")
             ):
                 continue
 
-            section_rules.append(rule["rule"])
+            if group_name in ("foundational", "triggered"):
+                all_rules.append(f"- [{rule['category']}] {rule['rule']}")
+            if rule["category"] == section_category:
+                section_rules.append(rule["rule"])
 
     # ------------------------------------------------------------------
     # 2️⃣ Prize Breakdown (Prevents Structure Hallucination)
@@ -115,26 +190,17 @@ Channel: Social Media Entry
         historical_snippets = filtered_snippets
 
     # ------------------------------------------------------------------
-    # 6️⃣ Historical Snippets Block
-    # ------------------------------------------------------------------
-    if historical_snippets:
-        snippets_block = "\n\n".join(
-            f"[Snippet ID: {s.get('id')} | Section: {s.get('section')}]\n{s.get('text')}"
-            for s in historical_snippets
-        )
-    else:
-        snippets_block = "None provided."
-
-    # ------------------------------------------------------------------
-    # 7️⃣ Compliance Rules Block
+    # 6️⃣ Compliance Rules Block
     # ------------------------------------------------------------------
     if section_rules:
         rules_block = "\n".join(f"- {r}" for r in section_rules)
     else:
         rules_block = "None specifically applicable beyond general compliance."
 
+    all_rules_block = "\n".join(all_rules) if all_rules else "None."
+
     # ------------------------------------------------------------------
-    # 8️⃣ Mandatory Clause Block
+    # 7️⃣ Mandatory Clause Block
     # ------------------------------------------------------------------
     if required_clauses:
         clauses_block = "\n".join(
@@ -145,9 +211,61 @@ Channel: Social Media Entry
         clauses_block = "None"
 
     # ------------------------------------------------------------------
-    # 9️⃣ Base Instruction Prompt
+    # 8️⃣ Base Instruction Prompt (snippets go between head and tail)
     # ------------------------------------------------------------------
-    instruction_prompt = f"""
+    layout = layout or PROMPT_LAYOUT
+    shared_prefix = ""
+
+    if layout == SHARED_PREFIX:
+        # Nothing section-specific may appear in here
+        shared_prefix = f"""
+You are drafting sections of a U.S. sweepstakes Official Rules document.
+
+GENERAL INSTRUCTIONS:
+- Use formal legal drafting style.
+- Follow the tone and structure of real Official Rules.
+- Use the Promotion Facts exactly as provided.
+- Do NOT invent additional prizes, states, dates, eligibility criteria, or prize structure.
+- Do NOT contradict compliance requirements.
+- Do NOT reintroduce 50-state eligibility language if specific states are listed.
+- If drafting the "How to Enter" section:
+  - Use the ENTRY METHOD DETAILS exactly as provided.
+  - Do NOT invent additional entry mechanics.
+  - If Web entry is listed, clearly state the URL and required fields.
+
+{promotion_facts_block}
+
+{entry_block}
+
+COMPLIANCE REQUIREMENTS FOR THIS PROMOTION (by category):
+{all_rules_block}
+"""
+        if count_tokens(SYSTEM_PROMPT) + count_tokens(shared_prefix) < PROMPT_CACHE_MIN_TOKENS:
+            # Too short to be cached: the extra prompt tokens would buy nothing
+            shared_prefix = ""
+
+    if shared_prefix:
+        prompt_head = shared_prefix + f"""
+SECTION TO DRAFT: "{section_name}"
+- Write ONLY this section.
+- Do NOT reference other sections.
+
+APPLICABLE COMPLIANCE REQUIREMENTS FOR THIS SECTION:
+{rules_block}
+
+MANDATORY CLAUSES (MUST APPEAR VERBATIM IF LISTED):
+{clauses_block}
+
+If any Mandatory Clauses are listed above:
+- You MUST include them exactly.
+- Do NOT paraphrase them.
+- They must appear clearly within this section.
+
+RELEVANT HISTORICAL LANGUAGE (for structure and tone only — do not copy verbatim):
+"""
+
+    else:
+        prompt_head = f"""
 You are drafting the "{section_name}" section of a U.S. sweepstakes Official Rules document.
 
 INSTRUCTIONS:
@@ -180,16 +298,18 @@ If any Mandatory Clauses are listed above:
 - They must appear clearly within this section.
 
 RELEVANT HISTORICAL LANGUAGE (for structure and tone only — do not copy verbatim):
-{snippets_block}
+"""
+
+    prompt_tail = """
 
 Generate the final drafted section below:
 """
 
     # ------------------------------------------------------------------
-    # 🔟 Prize-Specific Enforcement
+    # 9️⃣ Prize-Specific Enforcement
     # ------------------------------------------------------------------
     if section_category == "prizes":
-        instruction_prompt += """
+        prompt_tail += """
 
 PRIZE DRAFTING REQUIREMENTS (MANDATORY):
 - Enumerate each prize level separately.
@@ -200,6 +320,30 @@ PRIZE DRAFTING REQUIREMENTS (MANDATORY):
 - Do NOT describe the prize as a single item if multiple levels exist.
 """
 
-    return {
-        "prompt": instruction_prompt
-    }
\ No newline at end of file
+    # ------------------------------------------------------------------
+    # 🔟 Historical Snippets Block (packed into what's left of the budget)
+    # ------------------------------------------------------------------
+    if token_budget is None:
+        token_budget = PROMPT_TOKEN_BUDGET
+
+    fixed_tokens = count_tokens(SYSTEM_PROMPT) + count_tokens(prompt_head) + count_tokens(prompt_tail)
+    historical_snippets = pack_snippets(
+        historical_snippets or [],
+        max(0, token_budget - fixed_tokens) if token_budget > 0 else None,
+    )
+
+    if historical_snippets:
+        snippets_block = SNIPPET_SEPARATOR.join(_format_snippet(s) for s in historical_snippets)
+    else:
+        snippets_block = "None provided."
+
+    instruction_prompt = prompt_head + snippets_block + prompt_tail
+
+    payload = {
+        "prompt": instruction_prompt,
+        "prompt_tokens": count_tokens(SYSTEM_PROMPT) + count_tokens(instruction_prompt),
+    }
+    if shared_prefix:
+        # Routes every section of this promotion to the same provider cache
+        payload["prompt_cache_key"] = hashlib.sha256((SYSTEM_PROMPT + shared_prefix).encode("utf-8")).hexdigest()[:32]
+    return payload
\ No newline at end of file
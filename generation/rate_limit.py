@@ -0,0 +1,133 @@
+import os
+import time
+import asyncio
+import sqlite3
+import threading
+
+from metrics import RATE_LIMIT_WAIT
+from generation.tokens import count_tokens
+
+# -------------------------------------------------------------------
+# Cross-process rate limiter for model calls.
+#
+# Two token buckets (requests/min, estimated tokens/min) live in a local
+# SQLite file shared by every uvicorn worker. A call reserves its cost
+# up front inside one write transaction; buckets may go negative, and the
+# caller sleeps until its reservation is covered. Callers are therefore
+# served in the order they reserved, without polling.
+#
+# OPENAI_RPM / OPENAI_TPM = 0 disables the respective bucket.
+# -------------------------------------------------------------------
+OPENAI_RPM = float(os.getenv("OPENAI_RPM", "0"))
+OPENAI_TPM = float(os.getenv("OPENAI_TPM", "0"))
+RATE_LIMIT_PATH = os.getenv("RATE_LIMIT_PATH", ".rate_limit.sqlite3")
+RATE_LIMIT_MAX_WAIT = float(os.getenv("RATE_LIMIT_MAX_WAIT", "120"))
+
+# Added to the prompt estimate; completions are billed against TPM too
+EXPECTED_OUTPUT_TOKENS = int(os.getenv("OPENAI_EXPECTED_OUTPUT_TOKENS", "700"))
+
+
+class RateLimitTimeout(Exception):
+    """
+    The wait for capacity would exceed RATE_LIMIT_MAX_WAIT.
+    """
+
+
+def estimate_tokens(*texts: str) -> int:
+    return sum(count_tokens(t) for t in texts) + EXPECTED_OUTPUT_TOKENS
+
+
+class RateLimiter:
+    def __init__(self, path: str, rpm: float, tpm: float, max_wait: float):
+        self.path = path
+        self.limits = {"requests": rpm, "tokens": tpm}
+        self.max_wait = max_wait
+        self._initialized = False
+
+    def _connect(self) -> sqlite3.Connection:
+        # Autocommit mode: transactions are opened explicitly below
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        if not self._initialized:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS buckets (
+                    name    TEXT PRIMARY KEY,
+                    level   REAL NOT NULL,
+                    updated REAL NOT NULL
+                )
+                """
+            )
+            self._initialized = True
+        return conn
+
+    def reserve(self, tokens: int) -> float:
+        """
+        Reserve one request and `tokens` tokens. Returns how long the caller
+        must wait before sending; raises RateLimitTimeout (reserving nothing)
+        if that is longer than max_wait.
+        """
+        costs = {"requests": 1, "tokens": tokens}
+        now = time.time()
+
+        conn = self._connect()
+        try:
+            # IMMEDIATE: take the write lock before reading the buckets
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                wait = 0.0
+                levels = []
+                for name, limit in self.limits.items():
+                    if limit <= 0:
+                        continue
+                    rate = limit / 60.0
+                    row = conn.execute("SELECT level, updated FROM buckets WHERE name = ?", (name,)).fetchone()
+                    level = limit if row is None else min(limit, row[0] + (now - row[1]) * rate)
+                    level -= costs[name]
+                    wait = max(wait, -level / rate)
+                    levels.append((name, level, now))
+
+                if wait > self.max_wait:
+                    conn.execute("ROLLBACK")
+                    raise RateLimitTimeout(f"Rate limit queue is {wait:.0f}s long")
+
+                conn.executemany("INSERT OR REPLACE INTO buckets (name, level, updated) VALUES (?, ?, ?)", levels)
+                conn.execute("COMMIT")
+            except sqlite3.Error:
+                if conn.in_transaction:
+                    conn.execute("ROLLBACK")
+                raise
+        finally:
+            conn.close()
+
+        return wait
+
+    def acquire(self, tokens: int) -> None:
+        wait = self.reserve(tokens)
+        RATE_LIMIT_WAIT.observe(wait)
+        if wait > 0:
+            time.sleep(wait)
+
+    async def acquire_async(self, tokens: int) -> None:
+        wait = await asyncio.to_thread(self.reserve, tokens)
+        RATE_LIMIT_WAIT.observe(wait)
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+
+_limiter: RateLimiter | None = None
+_limiter_lock = threading.Lock()
+
+
+def get_rate_limiter() -> RateLimiter | None:
+    """
+    Process-wide limiter, or None when neither OPENAI_RPM nor OPENAI_TPM is set.
+    """
+    global _limiter
+    if OPENAI_RPM <= 0 and OPENAI_TPM <= 0:
+        return None
+    if _limiter is None:
+        with _limiter_lock:
+            if _limiter is None:
+                _limiter = RateLimiter(RATE_LIMIT_PATH, OPENAI_RPM, OPENAI_TPM, RATE_LIMIT_MAX_WAIT)
+    return _limiter
@@ -0,0 +1,97 @@
+import os
+from dataclasses import dataclass
+from pathlib import Path
+
+from jinja2 import Environment, FileSystemLoader, StrictUndefined
+
+# -------------------------------------------------------------------
+# Template-backed sections
+#
+#   "template" -> rendered from promotion facts + mandatory clauses, no model call
+#   "hybrid"   -> fixed skeleton; the model only drafts the {{ fill_in }} slot
+#
+# Set TEMPLATE_SECTIONS=0 to send every section to the model again.
+# -------------------------------------------------------------------
+TEMPLATE_SECTIONS_ENABLED = os.getenv("TEMPLATE_SECTIONS", "1") not in ("0", "false", "False", "")
+
+TEMPLATE_DIR = Path(__file__).resolve().parent / "templates"
+
+TEMPLATE = "template"
+HYBRID = "hybrid"
+
+
+@dataclass(frozen=True)
+class SectionTemplate:
+    mode: str
+    template_name: str
+    # Hybrid only: what the model is asked to draft for the slot
+    fill_in_instructions: str = ""
+    fill_in_max_sentences: int = 4
+
+
+SECTION_TEMPLATES: dict[str, SectionTemplate] = {
+    "classification": SectionTemplate(TEMPLATE, "classification.j2"),
+    "general_conditions": SectionTemplate(TEMPLATE, "general_conditions.j2"),
+    "winner_clearance": SectionTemplate(
+        HYBRID,
+        "winner_clearance.j2",
+        fill_in_instructions=(
+            "Draft only the remaining winner verification requirements from the applicable "
+            "compliance requirements (for example identity verification for higher-value prizes). "
+            "Notification timing, the affidavit/publicity release and the IRS Form W-9 language "
+            "are already written; do NOT repeat them and do NOT add a heading."
+        ),
+    ),
+}
+
+# Compiled templates are cached by the environment (once per process)
+_env = Environment(
+    loader=FileSystemLoader(TEMPLATE_DIR),
+    undefined=StrictUndefined,
+    autoescape=False,
+    trim_blocks=True,
+    lstrip_blocks=True,
+)
+
+
+def get_section_template(section_id: str) -> SectionTemplate | None:
+    if not TEMPLATE_SECTIONS_ENABLED:
+        return None
+    return SECTION_TEMPLATES.get(section_id)
+
+
+def _active_rule_ids(compliance_requirements: dict) -> set[str]:
+    return {
+        r.get("id")
+        for group in ("foundational", "triggered")
+        for r in compliance_requirements.get(group, [])
+    }
+
+
+def render_section(
+    spec: SectionTemplate,
+    promotion_context: dict,
+    compliance_requirements: dict,
+    required_clauses: list[dict],
+    fill_in: str = "",
+) -> str:
+    text = _env.get_template(spec.template_name).render(
+        **promotion_context,
+        active_rules=_active_rule_ids(compliance_requirements),
+        clauses={c["id"]: c["text"] for c in required_clauses},
+        fill_in=fill_in.strip(),
+    )
+    return text.strip()
+
+
+def fill_in_payload(spec: SectionTemplate, payload: dict) -> dict:
+    """
+    Narrow a full section payload down to the hybrid slot.
+    """
+    return dict(payload, prompt=payload["prompt"] + f"""
+
+HYBRID DRAFTING (OVERRIDES THE INSTRUCTIONS ABOVE):
+- The rest of this section is already fixed.
+- {spec.fill_in_instructions}
+- Write at most {spec.fill_in_max_sentences} sentences of plain paragraph text.
+""")
@@ -0,0 +1,57 @@
+import os
+import re
+from functools import lru_cache
+
+try:
+    import tiktoken
+except ImportError:  # optional: falls back to a character-based estimate
+    tiktoken = None
+
+# -------------------------------------------------------------------
+# Token counting for prompt budgeting and rate limiting.
+# Exact with tiktoken installed, ~4 characters/token otherwise.
+# -------------------------------------------------------------------
+TOKEN_ENCODING = os.getenv("TOKEN_ENCODING", "o200k_base")
+
+# A sentence or a line ends here (bullets / sub-clauses often lack a period)
+_SENTENCE_END = re.compile(r"(?<=[.!?;])\s+|\s*\n\s*")
+
+
+@lru_cache(maxsize=1)
+def _encoding():
+    if tiktoken is None:
+        return None
+    try:
+        return tiktoken.get_encoding(TOKEN_ENCODING)
+    except Exception:
+        # Encoding files unavailable (e.g. offline): use the estimate
+        return None
+
+
+def count_tokens(text: str | None) -> int:
+    if not text:
+        return 0
+    encoding = _encoding()
+    if encoding is None:
+        return (len(text) + 3) // 4
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def truncate_sentences(text: str, max_tokens: int) -> str:
+    """
+    Longest run of whole leading sentences (or lines) that fits in
+    max_tokens ("" if not even the first one does). The text is cut, not
+    re-joined, so numbering, bullets and line breaks stay as they were.
+    """
+    text = text.strip()
+    cut = 0
+    used = 0
+    for end in [m.start() for m in _SENTENCE_END.finditer(text)] + [len(text)]:
+        if end <= cut:
+            continue
+        # Each piece carries the separator before it
+        used += count_tokens(text[cut:end])
+        if used > max_tokens:
+            break
+        cut = end
+    return text[:cut]
@@ -0,0 +1,433 @@
+import os
+import json
+import time
+import uuid
+import random
+import asyncio
+import logging
+import sqlite3
+import threading
+from dataclasses import dataclass
+
+from generation.generate import GenerationError
+from metrics import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+# -------------------------------------------------------------------
+# Durable background jobs for document generation.
+#
+# Jobs, finished sections and results live in a local SQLite file, so a
+# restarted process picks up where the previous one stopped: a running
+# job holds a lease that its worker keeps renewing; once the lease runs
+# out any worker may claim the job again and only generates the sections
+# that are not stored yet.
+# -------------------------------------------------------------------
+JOBS_DB_PATH = os.getenv("JOBS_DB_PATH", ".jobs.sqlite3")
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+JOB_LEASE_SECONDS = float(os.getenv("JOB_LEASE_SECONDS", "60"))
+JOB_POLL_INTERVAL = float(os.getenv("JOB_POLL_INTERVAL", "1.0"))
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+JOB_RETRY_DELAY = float(os.getenv("JOB_RETRY_DELAY", "30"))
+JOB_RESULT_TTL = float(os.getenv("JOB_RESULT_TTL", str(7 * 24 * 3600)))
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+
+@dataclass(frozen=True)
+class ClaimedJob:
+    id: str
+    form: dict
+    attempts: int
+    sections: dict[str, str]
+
+
+class JobStore:
+    def __init__(self, path: str):
+        self.path = path
+        self._initialized = False
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=30)
+        if not self._initialized:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id          TEXT PRIMARY KEY,
+                    status      TEXT NOT NULL,
+                    form        TEXT NOT NULL,
+                    created     REAL NOT NULL,
+                    updated     REAL NOT NULL,
+                    run_after   REAL NOT NULL,
+                    owner       TEXT,
+                    lease_until REAL,
+                    attempts    INTEGER NOT NULL DEFAULT 0,
+                    error       TEXT,
+                    result      BLOB
+                )
+                """
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS jobs_status_created ON jobs (status, created)")
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS job_sections (
+                    job_id     TEXT NOT NULL,
+                    section_id TEXT NOT NULL,
+                    text       TEXT NOT NULL,
+                    PRIMARY KEY (job_id, section_id)
+                )
+                """
+            )
+            conn.commit()
+            self._initialized = True
+        return conn
+
+    # ---- API side ----
+    def create(self, form: dict) -> str:
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        conn = self._connect()
+        try:
+            with conn:
+                conn.execute(
+                    "INSERT INTO jobs (id, status, form, created, updated, run_after) VALUES (?, ?, ?, ?, ?, ?)",
+                    (job_id, QUEUED, json.dumps(form), now, now, now),
+                )
+        finally:
+            conn.close()
+        return job_id
+
+    def get(self, job_id: str) -> dict | None:
+        conn = self._connect()
+        try:
+            row = conn.execute(
+                "SELECT status, created, updated, attempts, error FROM jobs WHERE id = ?", (job_id,)
+            ).fetchone()
+            if row is None:
+                return None
+            done = conn.execute("SELECT COUNT(*) FROM job_sections WHERE job_id = ?", (job_id,)).fetchone()[0]
+        finally:
+            conn.close()
+
+        status, created, updated, attempts, error = row
+        return {
+            "id": job_id,
+            "status": status,
+            "sections_done": done,
+            "attempts": attempts,
+            "error": error,
+            "created_at": created,
+            "updated_at": updated,
+        }
+
+    def result(self, job_id: str) -> bytes | None:
+        conn = self._connect()
+        try:
+            row = conn.execute("SELECT result FROM jobs WHERE id = ? AND status = ?", (job_id, DONE)).fetchone()
+        finally:
+            conn.close()
+        return row[0] if row else None
+
+    def counts(self) -> dict[str, int]:
+        conn = self._connect()
+        try:
+            rows = conn.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall()
+        finally:
+            conn.close()
+        counts = {QUEUED: 0, RUNNING: 0, DONE: 0, FAILED: 0}
+        counts.update(dict(rows))
+        return counts
+
+    # ---- worker side ----
+    def claim(self, owner: str, lease_seconds: float) -> ClaimedJob | None:
+        """
+        Atomically take the oldest runnable job: queued and due, or running
+        with an expired lease (its worker died).
+        """
+        now = time.time()
+        conn = self._connect()
+        try:
+            with conn:
+                row = conn.execute(
+                    """
+                    UPDATE jobs
+                       SET status = ?, owner = ?, lease_until = ?, attempts = attempts + 1, updated = ?
+                     WHERE id = (
+                        SELECT id FROM jobs
+                         WHERE (status = ? AND run_after <= ?) OR (status = ? AND lease_until < ?)
+                         ORDER BY created
+                         LIMIT 1
+                     )
+                    RETURNING id, form, attempts
+                    """,
+                    (RUNNING, owner, now + lease_seconds, now, QUEUED, now, RUNNING, now),
+                ).fetchone()
+                if row is None:
+                    return None
+
+                job_id, form, attempts = row
+                sections = dict(conn.execute(
+                    "SELECT section_id, text FROM job_sections WHERE job_id = ?", (job_id,)
+                ).fetchall())
+        finally:
+            conn.close()
+        return ClaimedJob(job_id, json.loads(form), attempts, sections)
+
+    def _update_owned(self, job_id: str, owner: str, sql: str, params: tuple) -> bool:
+        conn = self._connect()
+        try:
+            with conn:
+                cur = conn.execute(f"UPDATE jobs SET {sql} WHERE id = ? AND owner = ? AND status = ?",
+                                   params + (job_id, owner, RUNNING))
+                return cur.rowcount == 1
+        finally:
+            conn.close()
+
+    def renew(self, job_id: str, owner: str, lease_seconds: float) -> bool:
+        return self._update_owned(job_id, owner, "lease_until = ?", (time.time() + lease_seconds,))
+
+    def save_section(self, job_id: str, owner: str, section_id: str, text: str) -> bool:
+        """
+        Store a finished section, only while `owner` still holds the job.
+        False: the lease was lost and another worker may be running it.
+        """
+        conn = self._connect()
+        try:
+            with conn:
+                cur = conn.execute(
+                    "UPDATE jobs SET updated = ? WHERE id = ? AND owner = ? AND status = ?",
+                    (time.time(), job_id, owner, RUNNING),
+                )
+                if cur.rowcount != 1:
+                    return False
+                conn.execute(
+                    "INSERT OR REPLACE INTO job_sections (job_id, section_id, text) VALUES (?, ?, ?)",
+                    (job_id, section_id, text),
+                )
+                return True
+        finally:
+            conn.close()
+
+    def complete(self, job_id: str, owner: str, result: bytes) -> bool:
+        return self._update_owned(
+            job_id, owner,
+            "status = ?, result = ?, error = NULL, owner = NULL, lease_until = NULL, updated = ?",
+            (DONE, result, time.time()),
+        )
+
+    def fail(self, job_id: str, owner: str, error: str, retry_in: float | None = None) -> bool:
+        """
+        Mark the job failed, or put it back in the queue after `retry_in` seconds.
+        """
+        now = time.time()
+        if retry_in is not None:
+            return self._update_owned(
+                job_id, owner,
+                "status = ?, error = ?, run_after = ?, owner = NULL, lease_until = NULL, updated = ?",
+                (QUEUED, error, now + retry_in, now),
+            )
+        return self._update_owned(
+            job_id, owner,
+            "status = ?, error = ?, owner = NULL, lease_until = NULL, updated = ?",
+            (FAILED, error, now),
+        )
+
+    def release(self, job_id: str, owner: str) -> bool:
+        """
+        Hand a job back on shutdown (kept sections are resumed), without
+        counting the interrupted run as an attempt.
+        """
+        return self._update_owned(
+            job_id, owner,
+            "status = ?, attempts = MAX(attempts - 1, 0), owner = NULL, lease_until = NULL, updated = ?",
+            (QUEUED, time.time()),
+        )
+
+    def purge(self, older_than_seconds: float) -> int:
+        cutoff = time.time() - older_than_seconds
+        conn = self._connect()
+        try:
+            with conn:
+                conn.execute(
+                    "DELETE FROM job_sections WHERE job_id IN "
+                    "(SELECT id FROM jobs WHERE status IN (?, ?) AND updated < ?)",
+                    (DONE, FAILED, cutoff),
+                )
+                return conn.execute(
+                    "DELETE FROM jobs WHERE status IN (?, ?) AND updated < ?", (DONE, FAILED, cutoff)
+                ).rowcount
+        finally:
+            conn.close()
+
+
+_store: JobStore | None = None
+_store_lock = threading.Lock()
+
+
+def get_job_store() -> JobStore:
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = JobStore(JOBS_DB_PATH)
+    return _store
+
+
+# -------------------------------------------------------------------
+# Worker pool
+# -------------------------------------------------------------------
+class JobWorkerPool:
+    def __init__(self, store: JobStore, workers: int = JOB_WORKERS):
+        self.store = store
+        self.workers = workers
+        self._tasks: list[asyncio.Task] = []
+        self._wakeup: asyncio.Event | None = None
+
+    def start(self) -> None:
+        self._wakeup = asyncio.Event()
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def notify(self) -> None:
+        # New job enqueued in this process: skip the poll delay
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    async def _store_call(self, fn, *args):
+        """
+        Store access from the worker loop: a database error (e.g. "database
+        is locked") is logged and returns None instead of ending the worker.
+        """
+        try:
+            return await asyncio.to_thread(fn, *args)
+        except sqlite3.Error:
+            logger.exception("Job store call %s failed", fn.__name__)
+            return None
+
+    async def _worker(self) -> None:
+        owner = uuid.uuid4().hex
+        last_purge = 0.0
+        while True:
+            if time.time() - last_purge > 3600:
+                await self._store_call(self.store.purge, JOB_RESULT_TTL)
+                last_purge = time.time()
+
+            try:
+                job = await asyncio.to_thread(self.store.claim, owner, JOB_LEASE_SECONDS)
+            except sqlite3.Error:
+                logger.exception("Could not claim a job")
+                job = None
+            if job is None:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), JOB_POLL_INTERVAL)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            try:
+                await self._run(job, owner)
+            except Exception:
+                # Never let one job shrink the pool
+                logger.exception("Worker error while running job %s", job.id)
+
+    async def _heartbeat(self, job_id: str, owner: str, abandon) -> None:
+        while True:
+            await asyncio.sleep(JOB_LEASE_SECONDS / 3)
+            renewed = await self._store_call(self.store.renew, job_id, owner, JOB_LEASE_SECONDS)
+            if renewed is False:
+                # Lease expired and was claimed elsewhere: stop working on it
+                abandon()
+                return
+
+    async def _run(self, job: ClaimedJob, owner: str) -> None:
+        # Imported here: generate_service pulls in the whole generation stack
+        from generate_service import generate_official_rules_async
+
+        if job.attempts > JOB_MAX_ATTEMPTS:
+            # Its workers kept dying mid-run
+            await self._store_call(self.store.fail, job.id, owner, f"Gave up after {JOB_MAX_ATTEMPTS} attempts")
+            return
+
+        lease_lost = False
+
+        def abandon() -> None:
+            nonlocal lease_lost
+            lease_lost = True
+            generation.cancel()
+
+        async def save(section_id: str, text: str) -> None:
+            saved = await self._store_call(self.store.save_section, job.id, owner, section_id, text)
+            if saved is False:
+                abandon()
+
+        generation = asyncio.create_task(generate_official_rules_async(
+            job.form,
+            completed_sections=job.sections,
+            on_section_done=save,
+        ))
+        heartbeat = asyncio.create_task(self._heartbeat(job.id, owner, abandon))
+        try:
+            buffer = await generation
+            if await self._store_call(self.store.complete, job.id, owner, buffer.getvalue()) is False:
+                logger.warning("Job %s: lease lost before the result was stored", job.id)
+
+        except asyncio.CancelledError:
+            if lease_lost and not asyncio.current_task().cancelling():
+                logger.warning("Job %s: lease lost to another worker, abandoning this run", job.id)
+                return
+            await asyncio.shield(self._store_call(self.store.release, job.id, owner))
+            raise
+
+        except GenerationError as e:
+            retry_in = None
+            if job.attempts < JOB_MAX_ATTEMPTS:
+                retry_in = random.uniform(0.5, 1.5) * JOB_RETRY_DELAY * job.attempts
+            await self._store_call(self.store.fail, job.id, owner, str(e), retry_in)
+
+        except (ValueError, KeyError) as e:
+            # Invalid promotion data: retrying won't help
+            await self._store_call(self.store.fail, job.id, owner, f"Invalid request: {e}")
+
+        except Exception as e:
+            logger.exception("Job %s failed", job.id)
+            await self._store_call(self.store.fail, job.id, owner, f"Unexpected error: {e}")
+
+        finally:
+            heartbeat.cancel()
+            generation.cancel()
+
+
+def _jobs_collector() -> list[str]:
+    lines = ["# HELP trymark_jobs Generation jobs by status.", "# TYPE trymark_jobs gauge"]
+    for status, count in sorted(get_job_store().counts().items()):
+        lines.append(f'trymark_jobs{{status="{status}"}} {count}')
+    return lines
+
+
+REGISTRY.register_collector(_jobs_collector)
+
+
+async def _run_forever() -> None:
+    pool = JobWorkerPool(get_job_store(), max(1, JOB_WORKERS))
+    pool.start()
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await pool.stop()
+
+
+if __name__ == "__main__":
+    # Standalone worker process (e.g. with JOB_WORKERS=0 on the web process)
+    from dotenv import load_dotenv
+    load_dotenv()
+    asyncio.run(_run_forever())
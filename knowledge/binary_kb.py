@@ -0,0 +1,174 @@
+import json
+import mmap
+import struct
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Sequence
+
+# =========================
+# COMPACT KB FORMAT (.kbin)
+#
+#   header   | magic, version, chunk count, section offsets
+#   strings  | JSON: interned doc_type/section/channel values + tag vocabulary
+#   records  | fixed-width metadata, one per chunk (see RECORD)
+#   blob     | UTF-8 ids and texts, addressed by (offset, length)
+#
+# Opened via mmap, so every worker maps the same page-cache pages and a
+# chunk's text is only decoded when that chunk is actually read.
+# =========================
+
+MAGIC = b"TMKB"
+VERSION = 1
+
+# magic, version, reserved, n_chunks, strings_off, records_off, blob_off
+HEADER = struct.Struct("<4sHHIQQQ")
+# doc_type, section, channel, hard_constraint, tags bitmask, id_off, id_len, text_off, text_len
+RECORD = struct.Struct("<HHHBxQQIQI")
+
+NONE = 0xFFFF
+MAX_TAGS = 64
+
+
+def binary_path_for(kb_path: Path) -> Path:
+    return Path(kb_path).with_suffix(".kbin")
+
+
+def write_binary_kb(entries: List[Dict[str, Any]], f) -> None:
+    """
+    Serialize KB entries (same dicts as knowledge_base.json) to `f`.
+    """
+    strings: List[str] = []
+    string_ids: Dict[str, int] = {}
+    tags: List[str] = []
+    tag_bits: Dict[str, int] = {}
+
+    def intern(value: Optional[str]) -> int:
+        if value is None:
+            return NONE
+        if value not in string_ids:
+            if len(strings) >= NONE:
+                raise ValueError("Too many distinct doc_type/section/channel values for the binary KB format")
+            string_ids[value] = len(strings)
+            strings.append(value)
+        return string_ids[value]
+
+    records = bytearray()
+    blob = bytearray()
+
+    for entry in entries:
+        mask = 0
+        for tag in entry.get("tags") or []:
+            if tag not in tag_bits:
+                if len(tags) >= MAX_TAGS:
+                    raise ValueError(f"The binary KB format supports at most {MAX_TAGS} distinct tags")
+                tag_bits[tag] = len(tags)
+                tags.append(tag)
+            mask |= 1 << tag_bits[tag]
+
+        id_bytes = str(entry.get("id") or "").encode("utf-8")
+        text_bytes = (entry.get("text") or "").encode("utf-8")
+
+        id_off = len(blob)
+        blob += id_bytes
+        text_off = len(blob)
+        blob += text_bytes
+
+        records += RECORD.pack(
+            intern(entry.get("doc_type")),
+            intern(entry.get("section")),
+            intern(entry.get("channel")),
+            1 if entry.get("hard_constraint") else 0,
+            mask,
+            id_off, len(id_bytes),
+            text_off, len(text_bytes),
+        )
+
+    string_table = json.dumps({"strings": strings, "tags": tags}, ensure_ascii=False).encode("utf-8")
+
+    strings_off = HEADER.size
+    records_off = strings_off + len(string_table)
+    blob_off = records_off + len(records)
+
+    f.write(HEADER.pack(MAGIC, VERSION, 0, len(entries), strings_off, records_off, blob_off))
+    f.write(string_table)
+    f.write(records)
+    f.write(blob)
+
+
+class MmapKnowledgeBase(Sequence):
+    """
+    Read-only, list-like view over a .kbin file.
+
+    Indexing returns a chunk dict (text decoded on demand); the
+    field accessors avoid decoding text at all.
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        with open(self.path, "rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, version, _, n_chunks, strings_off, records_off, blob_off = HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC or version != VERSION:
+            self._mm.close()
+            raise ValueError(f"{self.path} is not a version {VERSION} binary knowledge base")
+
+        table = json.loads(self._mm[strings_off:records_off].decode("utf-8"))
+        self._strings: List[str] = table["strings"]
+        self._tags: List[str] = table["tags"]
+        self._n = n_chunks
+        self._records_off = records_off
+        self._blob_off = blob_off
+
+    def __len__(self) -> int:
+        return self._n
+
+    def _record(self, i: int) -> tuple:
+        if i < 0:
+            i += self._n
+        if not 0 <= i < self._n:
+            raise IndexError(i)
+        return RECORD.unpack_from(self._mm, self._records_off + i * RECORD.size)
+
+    def _string(self, sid: int) -> Optional[str]:
+        return None if sid == NONE else self._strings[sid]
+
+    def _decode(self, off: int, length: int) -> str:
+        start = self._blob_off + off
+        return self._mm[start:start + length].decode("utf-8")
+
+    # ---- field accessors (no text decoding) ----
+    def doc_type(self, i: int) -> Optional[str]:
+        return self._string(self._record(i)[0])
+
+    def section(self, i: int) -> Optional[str]:
+        return self._string(self._record(i)[1])
+
+    def hard_constraint(self, i: int) -> bool:
+        return bool(self._record(i)[3])
+
+    def text(self, i: int) -> str:
+        r = self._record(i)
+        return self._decode(r[7], r[8])
+
+    # ---- full chunk ----
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(self._n))]
+
+        doc_type, section, channel, hard, mask, id_off, id_len, text_off, text_len = self._record(i)
+        return {
+            "id": self._decode(id_off, id_len),
+            "doc_type": self._string(doc_type),
+            "section": self._string(section),
+            "channel": self._string(channel),
+            "hard_constraint": bool(hard),
+            "text": self._decode(text_off, text_len),
+            "tags": [t for bit, t in enumerate(self._tags) if mask & (1 << bit)],
+        }
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        for i in range(self._n):
+            yield self[i]
+
+    def close(self) -> None:
+        self._mm.close()
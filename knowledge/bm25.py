@@ -0,0 +1,168 @@
+import json
+import hashlib
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+try:
+    import numpy as np
+except ImportError:  # optional: only needed when RETRIEVAL_SCORER=bm25
+    np = None
+
+# =========================
+# BM25 SCORING ENGINE (optional)
+#
+# Term-major sparse matrix (CSC layout in plain NumPy arrays):
+#   term_ptr[t]:term_ptr[t+1] -> slice of doc_idx / weights for term t
+# weights already hold the full BM25 term contribution, so a query is one
+# gather + one bincount over the postings of its terms.
+# =========================
+
+K1 = 1.2
+B = 0.75
+FORMAT_VERSION = 1
+
+
+def _require_numpy():
+    if np is None:
+        raise ImportError("The BM25 retrieval engine requires numpy (pip install numpy).")
+
+
+def tokenize(text: Optional[str]) -> List[str]:
+    # Same normalization as the lexical scorer, split on whitespace
+    from knowledge.retrieval import normalize
+    return normalize(text).split()
+
+
+def chunk_tokens(chunk: Dict[str, Any]) -> List[str]:
+    return tokenize(chunk.get("section")) + tokenize(chunk.get("text"))
+
+
+def kb_digest(raw: bytes) -> str:
+    return hashlib.sha256(raw).hexdigest()
+
+
+class BM25Index:
+    def __init__(self, vocab: Dict[str, int], term_ptr, doc_idx, weights, n_docs: int, kb_sha256: str = ""):
+        self.vocab = vocab
+        self.term_ptr = term_ptr
+        self.doc_idx = doc_idx
+        self.weights = weights
+        self.n_docs = n_docs
+        self.kb_sha256 = kb_sha256
+
+    # ---- build ----
+    @classmethod
+    def build(cls, chunks: List[Dict[str, Any]], kb_sha256: str = "", k1: float = K1, b: float = B) -> "BM25Index":
+        _require_numpy()
+
+        vocab: Dict[str, int] = {}
+        rows: List[int] = []
+        cols: List[int] = []
+        counts: List[int] = []
+        lengths = np.zeros(len(chunks), dtype=np.float64)
+
+        for d, chunk in enumerate(chunks):
+            tf: Dict[int, int] = {}
+            tokens = chunk_tokens(chunk)
+            lengths[d] = len(tokens)
+            for tok in tokens:
+                t = vocab.setdefault(tok, len(vocab))
+                tf[t] = tf.get(t, 0) + 1
+            for t, c in tf.items():
+                rows.append(d)
+                cols.append(t)
+                counts.append(c)
+
+        doc = np.asarray(rows, dtype=np.int32)
+        term = np.asarray(cols, dtype=np.int32)
+        tf = np.asarray(counts, dtype=np.float64)
+
+        n_docs = len(chunks)
+        avgdl = float(lengths.mean()) if n_docs else 0.0
+        df = np.bincount(term, minlength=len(vocab)).astype(np.float64)
+        idf = np.log(1.0 + (n_docs - df + 0.5) / (df + 0.5))
+
+        norm = k1 * (1.0 - b + b * (lengths[doc] / avgdl)) if avgdl else np.full(len(doc), k1)
+        weights = (idf[term] * tf * (k1 + 1.0) / (tf + norm)).astype(np.float32)
+
+        # Sort postings term-major
+        order = np.argsort(term, kind="stable")
+        term_ptr = np.zeros(len(vocab) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(term, minlength=len(vocab)), out=term_ptr[1:])
+
+        return cls(vocab, term_ptr, doc[order], weights[order], n_docs, kb_sha256)
+
+    # ---- persistence ----
+    def save(self, target) -> None:
+        """
+        `target` is a path or a binary file object.
+        """
+        _require_numpy()
+        terms = sorted(self.vocab, key=self.vocab.get)
+        np.savez(
+            target,
+            meta=np.frombuffer(json.dumps({
+                "version": FORMAT_VERSION,
+                "n_docs": self.n_docs,
+                "kb_sha256": self.kb_sha256,
+                "terms": terms,
+            }).encode("utf-8"), dtype=np.uint8),
+            term_ptr=self.term_ptr,
+            doc_idx=self.doc_idx,
+            weights=self.weights,
+        )
+
+    @classmethod
+    def load(cls, path: Path) -> Optional["BM25Index"]:
+        _require_numpy()
+        if not Path(path).exists():
+            return None
+        with np.load(path) as data:
+            meta = json.loads(data["meta"].tobytes().decode("utf-8"))
+            if meta.get("version") != FORMAT_VERSION:
+                return None
+            vocab = {t: i for i, t in enumerate(meta["terms"])}
+            return cls(vocab, data["term_ptr"], data["doc_idx"], data["weights"], meta["n_docs"], meta["kb_sha256"])
+
+    # ---- query ----
+    def score(self, query_terms: List[str]):
+        """
+        BM25 score of every chunk for the query, as one float array.
+        Repeated query terms count once per occurrence.
+        """
+        ids = [self.vocab[t] for t in query_terms if t in self.vocab]
+        if not ids:
+            return np.zeros(self.n_docs, dtype=np.float64)
+
+        term_ids, qtf = np.unique(np.asarray(ids, dtype=np.int64), return_counts=True)
+        starts = self.term_ptr[term_ids]
+        ends = self.term_ptr[term_ids + 1]
+        sizes = ends - starts
+
+        # Gather every posting of every query term in one go
+        offsets = np.repeat(starts - np.concatenate(([0], np.cumsum(sizes)[:-1])), sizes)
+        positions = np.arange(int(sizes.sum())) + offsets
+        weights = self.weights[positions] * np.repeat(qtf, sizes)
+
+        return np.bincount(self.doc_idx[positions], weights=weights, minlength=self.n_docs)
+
+    def top_k(self, query_terms: List[str], k: int):
+        """
+        (indices, scores) of the k best chunks with a positive score,
+        best-first; partial sort via argpartition.
+        """
+        if k <= 0:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float64)
+        scores = self.score(query_terms)
+        positive = np.flatnonzero(scores > 0)
+        if positive.size > k:
+            part = np.argpartition(-scores[positive], k - 1)[:k]
+            positive = positive[part]
+        # stable sort by (-score, index) so ties keep KB order
+        order = np.lexsort((positive, -scores[positive]))
+        best = positive[order]
+        return best, scores[best]
+
+
+def bm25_path_for(kb_path: Path) -> Path:
+    return Path(kb_path).with_suffix(".bm25.npz")
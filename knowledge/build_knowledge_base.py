@@ -1,15 +1,27 @@
 import os
+import sys
 import json
-import uuid
 import re
+import hashlib
+import argparse
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
 from docx import Document
 
+if not __package__:
+    # Run as `python knowledge/build_knowledge_base.py`: make the repo root importable
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from knowledge.binary_kb import binary_path_for, write_binary_kb    # noqa: E402
+
 # =========================
 # CONFIG
 # =========================
 
 RAW_DOCS_DIR = "./raw_documents"
 OUTPUT_FILE = "knowledge_base.json"
+MANIFEST_FILE = "knowledge_base.manifest.json"
+MANIFEST_VERSION = 1
 
 SECTION_HEADERS = [
     "Eligibility",
@@ -114,6 +126,16 @@ def classify_section(section):
     }
     return mapping.get(section, (False, []))
 
+# =========================
+# DETERMINISTIC IDS
+# =========================
+
+def chunk_id(filename, label, text):
+    # Same shape as before (<file>_<section|channel>_<6 hex>) but derived from
+    # content, so an unchanged chunk keeps its id across rebuilds
+    digest = hashlib.sha256(text.encode("utf-8")).hexdigest()[:6]
+    return f"{filename}_{label}_{digest}"
+
 # =========================
 # MAIN PIPELINE
 # =========================
@@ -136,7 +158,7 @@ def process_docx(path):
 
         for channel, chunk in chunks.items():
             entries.append({
-                "id": f"{filename}_{channel}_{uuid.uuid4().hex[:6]}",
+                "id": chunk_id(filename, channel, chunk),
                 "doc_type": "abbreviated_disclosure",
                 "section": None,
                 "channel": channel,
@@ -151,7 +173,7 @@ def process_docx(path):
         for section, chunk in sections.items():
             hard, tags = classify_section(section)
             entries.append({
-                "id": f"{filename}_{section}_{uuid.uuid4().hex[:6]}",
+                "id": chunk_id(filename, section, chunk),
                 "doc_type": "official_rules",
                 "section": section,
                 "channel": None,
@@ -162,20 +184,153 @@ def process_docx(path):
 
     return entries
 
-def main():
+# =========================
+# INCREMENTAL BUILD
+# =========================
+
+def file_sha256(path):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def load_manifest(path):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {"version": MANIFEST_VERSION, "files": {}}
+    if manifest.get("version") != MANIFEST_VERSION:
+        return {"version": MANIFEST_VERSION, "files": {}}
+    return manifest
+
+
+def _file_mode(path):
+    """
+    Mode for a rewritten file: the existing file's, else what open() would
+    give a new one (mkstemp always creates 0600).
+    """
+    try:
+        return os.stat(path).st_mode & 0o777
+    except FileNotFoundError:
+        umask = os.umask(0)
+        os.umask(umask)
+        return 0o666 & ~umask
+
+
+def write_atomic(path, write):
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(prefix=".tmp_", dir=directory)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            write(f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.chmod(tmp_path, _file_mode(path))
+        # Readers (e.g. the retrieval cache) only ever see the old or the new file
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+
+
+def write_json_atomic(path, data, indent=None):
+    raw = json.dumps(data, indent=indent, ensure_ascii=False).encode("utf-8")
+    write_atomic(path, lambda f: f.write(raw))
+    return raw
+
+
+def write_bm25_index(entries, kb_raw, output_file):
+    """
+    Precompute the optional BM25 term matrix next to the KB (needs numpy).
+    """
+    from knowledge.bm25 import BM25Index, bm25_path_for, kb_digest, np
+    if np is None:
+        print("ℹ️  numpy not installed; skipping BM25 index")
+        return
+    engine = BM25Index.build(entries, kb_sha256=kb_digest(kb_raw))
+    write_atomic(bm25_path_for(output_file), engine.save)
+
+
+def _parse(path):
+    return os.path.basename(path), file_sha256(path), process_docx(path)
+
+
+def _parse_all(paths, workers=None):
+    if len(paths) <= 1 or workers == 1:
+        return [_parse(p) for p in paths]
+
+    workers = workers or os.cpu_count() or 1
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(_parse, paths, chunksize=max(1, len(paths) // (workers * 4))))
+
+
+def build(raw_dir=RAW_DOCS_DIR, output_file=OUTPUT_FILE, manifest_file=MANIFEST_FILE, workers=None, force=False):
+    manifest = {"version": MANIFEST_VERSION, "files": {}} if force else load_manifest(manifest_file)
+    previous = manifest["files"]
+    files = {}
+    to_parse = []
+
+    for file in sorted(os.listdir(raw_dir)):
+        if not file.lower().endswith(".docx"):
+            continue
+        path = os.path.join(raw_dir, file)
+        st = os.stat(path)
+        old = previous.get(file)
+
+        # Cheap check first (size + mtime), then content hash
+        if old and old["size"] == st.st_size and old["mtime_ns"] == st.st_mtime_ns:
+            files[file] = old
+            continue
+        if old and old["sha256"] == file_sha256(path):
+            files[file] = dict(old, size=st.st_size, mtime_ns=st.st_mtime_ns)
+            continue
+
+        to_parse.append(path)
+        files[file] = {"size": st.st_size, "mtime_ns": st.st_mtime_ns}
+
+    for file, sha, entries in _parse_all(to_parse, workers):
+        print(f"Processing: {file}")
+        files[file].update({"sha256": sha, "chunks": entries})
+
+    removed = sorted(set(previous) - set(files))
+    for file in removed:
+        print(f"Removed: {file}")
+
     all_entries = []
+    for file in sorted(files):
+        all_entries.extend(files[file]["chunks"])
+
+    # JSON stays the debuggable source of truth; .kbin is the compact
+    # mmap format served with KB_FORMAT=mmap
+    kb_raw = write_json_atomic(output_file, all_entries, indent=2)
+    write_atomic(binary_path_for(output_file), lambda f: write_binary_kb(all_entries, f))
+    write_bm25_index(all_entries, kb_raw, output_file)
+    write_json_atomic(manifest_file, {"version": MANIFEST_VERSION, "files": files})
+
+    return {
+        "files": len(files),
+        "parsed": len(to_parse),
+        "reused": len(files) - len(to_parse),
+        "removed": len(removed),
+        "chunks": len(all_entries),
+    }
+
 
-    for file in os.listdir(RAW_DOCS_DIR):
-        if file.lower().endswith(".docx"):
-            path = os.path.join(RAW_DOCS_DIR, file)
-            print(f"Processing: {file}")
-            all_entries.extend(process_docx(path))
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build knowledge_base.json from raw .docx rules.")
+    parser.add_argument("--workers", type=int, default=None, help="parser processes (default: CPU count)")
+    parser.add_argument("--force", action="store_true", help="ignore the manifest and re-parse every file")
+    args = parser.parse_args(argv)
 
-    with open(OUTPUT_FILE, "w", encoding="utf-8") as f:
-        json.dump(all_entries, f, indent=2, ensure_ascii=False)
+    stats = build(workers=args.workers, force=args.force)
 
     print(f"\n✅ Knowledge base built: {OUTPUT_FILE}")
-    print(f"📦 Total chunks: {len(all_entries)}")
+    print(f"📄 Files: {stats['files']} (parsed {stats['parsed']}, reused {stats['reused']}, removed {stats['removed']})")
+    print(f"📦 Total chunks: {stats['chunks']}")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -1,11 +1,20 @@
 import json
+import os
 import re
 import hashlib
+import threading
 from pathlib import Path
 from typing import Dict, List, Any, Optional, Tuple
 
 KB_PATH = Path("knowledge_base.json")
 
+# "json" (knowledge_base.json parsed into dicts) or "mmap" (compact
+# knowledge_base.kbin shared between workers through the page cache)
+KB_FORMAT = os.getenv("KB_FORMAT", "json")
+
+# "lexical" (hand-tuned keyword scorer) or "bm25" (optional NumPy engine)
+RETRIEVAL_SCORER = os.getenv("RETRIEVAL_SCORER", "lexical")
+
 # Category → keyword hints
 CATEGORY_KEYWORDS = {
     "sweepstakes_classification": ["intro", "general", "overview", "conditions", "agreement", "official rules"],
@@ -34,6 +43,134 @@ def load_knowledge_base() -> List[Dict[str, Any]]:
         return json.load(f)
 
 
+# -------------------------------------------------------------------
+# Process-wide KB cache
+#   - parsed once per process, shared by every request/thread
+#   - revalidated with a cheap stat() (mtime + size) on each access
+#   - a rebuilt file is re-parsed and swapped in with one assignment
+# -------------------------------------------------------------------
+_kb_lock = threading.Lock()
+_kb_cache: Optional[Tuple[Tuple[int, int], List[Dict[str, Any]], "KeywordIndex"]] = None
+_kb_stats = {"loads": 0, "hits": 0, "reloads": 0}
+
+
+def _kb_source_path() -> Path:
+    if KB_FORMAT == "mmap":
+        from knowledge.binary_kb import binary_path_for
+        return binary_path_for(KB_PATH)
+    return Path(KB_PATH)
+
+
+def _kb_signature() -> Tuple[int, int]:
+    path = _kb_source_path()
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        raise FileNotFoundError(f"{path.name} not found")
+    return (st.st_mtime_ns, st.st_size)
+
+
+def _load_kb_source():
+    if KB_FORMAT == "mmap":
+        from knowledge.binary_kb import MmapKnowledgeBase
+        return MmapKnowledgeBase(_kb_source_path())
+    return load_knowledge_base()
+
+
+def _kb_snapshot() -> Tuple[Tuple[int, int], List[Dict[str, Any]], "KeywordIndex"]:
+    global _kb_cache
+
+    signature = _kb_signature()
+    cached = _kb_cache
+    if cached is not None and cached[0] == signature:
+        _kb_stats["hits"] += 1
+        return cached
+
+    with _kb_lock:
+        # Another thread may have reloaded while we waited for the lock
+        cached = _kb_cache
+        if cached is not None and cached[0] == signature:
+            _kb_stats["hits"] += 1
+            return cached
+
+        kb = _load_kb_source()
+        # Keep the pre-parse signature: a write that lands mid-load changes
+        # the stat again, so the next call re-parses instead of going stale.
+        # (mmap KBs keep their text on the shared pages, not in the index)
+        snapshot = (signature, kb, KeywordIndex(kb, keep_text=KB_FORMAT != "mmap"))
+        _kb_cache = snapshot
+        _kb_stats["reloads" if cached is not None else "loads"] += 1
+        return snapshot
+
+
+def get_knowledge_base() -> List[Dict[str, Any]]:
+    """
+    Cached KB handle. Callers must treat the returned list as read-only.
+    With KB_FORMAT=mmap this is a list-like MmapKnowledgeBase.
+    """
+    return _kb_snapshot()[1]
+
+
+def get_knowledge_index() -> "KeywordIndex":
+    """
+    Keyword index built for the currently cached KB.
+    """
+    return _kb_snapshot()[2]
+
+
+_bm25_lock = threading.Lock()
+_bm25_cache: Optional[Tuple[Tuple[int, int], Any]] = None
+
+
+def get_bm25_index():
+    """
+    BM25 engine for the currently cached KB. Uses the matrix written by
+    build_knowledge_base when it matches the KB file, else builds in memory.
+    """
+    global _bm25_cache
+    from knowledge.bm25 import BM25Index, bm25_path_for, kb_digest
+
+    signature, kb, _ = _kb_snapshot()
+    cached = _bm25_cache
+    if cached is not None and cached[0] == signature:
+        return cached[1]
+
+    with _bm25_lock:
+        cached = _bm25_cache
+        if cached is not None and cached[0] == signature:
+            return cached[1]
+
+        try:
+            digest = kb_digest(Path(KB_PATH).read_bytes())
+            engine = BM25Index.load(bm25_path_for(KB_PATH))
+        except FileNotFoundError:
+            digest, engine = "", None
+        if engine is None or engine.kb_sha256 != digest or engine.n_docs != len(kb):
+            engine = BM25Index.build(kb, kb_sha256=digest)
+
+        _bm25_cache = (signature, engine)
+        return engine
+
+
+def preload_knowledge_base() -> None:
+    """
+    Load the KB and build whatever index the configured scorer uses.
+    """
+    _kb_snapshot()
+    if RETRIEVAL_SCORER == "bm25":
+        get_bm25_index()
+
+
+def kb_cache_stats() -> Dict[str, int]:
+    return dict(_kb_stats)
+
+
+def clear_knowledge_base_cache() -> None:
+    global _kb_cache
+    with _kb_lock:
+        _kb_cache = None
+
+
 def normalize(text: Optional[str]) -> str:
     return re.sub(r"[^\w\s]", " ", (text or "").lower()).strip()
 
@@ -53,6 +190,9 @@ def _score_chunk(
     """
     Simple lexical scoring (cheap + deterministic).
     You can swap this out later for embeddings.
+
+    Reference implementation: retrieval goes through KeywordIndex.score,
+    which must produce the same numbers.
     """
     text = normalize(chunk.get("text"))
     section = normalize(chunk.get("section"))
@@ -95,6 +235,160 @@ def _score_chunk(
     return score
 
 
+class KeywordIndex:
+    """
+    Inverted index over a KB for the lexical scorer above.
+
+    Normalized text/section and stable ids are computed once per KB, and
+    every keyword/phrase maps to posting lists of the chunks whose section
+    or text contains it (same substring semantics as _score_chunk).
+    Postings for the known keyword tables are built up front in one pass
+    over the chunks; any other phrase is indexed on first use and memoized.
+
+    keep_text=False drops the normalized texts after the build pass (used
+    for mmap KBs); a later unknown phrase then re-reads text from the KB.
+    """
+
+    def __init__(self, chunks: List[Dict[str, Any]], keep_text: bool = True):
+        self.chunks = chunks
+        self.sections: List[str] = []
+        self.texts: Optional[List[str]] = [] if keep_text else None
+        self.ids: List[str] = []
+        # Score every chunk gets before any keyword matches
+        self.base_scores: List[int] = []
+
+        phrases = set(SECTION_TITLE_KEYWORDS) | {c.replace("_", " ") for c in CATEGORY_KEYWORDS}
+        for keywords in list(CATEGORY_KEYWORDS.values()) + list(SECTION_TITLE_KEYWORDS.values()):
+            phrases.update(keywords)
+        nphrases = sorted({normalize(p) for p in phrases})
+
+        self._section_postings: Dict[str, List[int]] = {p: [] for p in nphrases}
+        self._text_postings: Dict[str, List[int]] = {p: [] for p in nphrases}
+
+        for i, c in enumerate(chunks):
+            section = normalize(c.get("section"))
+            text = normalize(c.get("text"))
+            doc_type = normalize(c.get("doc_type"))
+
+            self.sections.append(section)
+            if self.texts is not None:
+                self.texts.append(text)
+            self.ids.append(stable_id(c))
+
+            base = 80 if c.get("hard_constraint") else 0
+            if "official_rules" in doc_type or "official rules" in doc_type:
+                base += 8
+            self.base_scores.append(base)
+
+            for p in nphrases:
+                if p in section:
+                    self._section_postings[p].append(i)
+                if p in text:
+                    self._text_postings[p].append(i)
+
+    def section_postings(self, nphrase: str) -> List[int]:
+        hits = self._section_postings.get(nphrase)
+        if hits is None:
+            hits = [i for i, s in enumerate(self.sections) if nphrase in s]
+            self._section_postings[nphrase] = hits
+        return hits
+
+    def text_postings(self, nphrase: str) -> List[int]:
+        hits = self._text_postings.get(nphrase)
+        if hits is None:
+            texts = self.texts if self.texts is not None else (normalize(c.get("text")) for c in self.chunks)
+            hits = [i for i, t in enumerate(texts) if nphrase in t]
+            self._text_postings[nphrase] = hits
+        return hits
+
+    def score(
+        self,
+        category: str,
+        section_title: str,
+        category_keywords: List[str],
+        title_keywords: List[str],
+        threshold: int,
+    ) -> Dict[int, int]:
+        """
+        Returns {chunk index: score} for every chunk scoring >= threshold.
+        Scores are identical to _score_chunk; only candidate chunks are visited.
+        """
+        bonus: Dict[int, int] = {}
+
+        def add(hits: List[int], weight: int) -> None:
+            for i in hits:
+                bonus[i] = bonus.get(i, 0) + weight
+
+        ntitle = normalize(section_title)
+        if ntitle:
+            add(self.section_postings(ntitle), 60)
+        add(self.section_postings(normalize(category.replace("_", " "))), 35)
+
+        for kw in title_keywords:
+            nkw = normalize(kw)
+            if nkw:
+                add(self.section_postings(nkw), 35)
+                add(self.text_postings(nkw), 20)
+
+        for kw in category_keywords:
+            nkw = normalize(kw)
+            if nkw:
+                add(self.section_postings(nkw), 25)
+                add(self.text_postings(nkw), 12)
+
+        base = self.base_scores
+        scores = {
+            i: base[i] + b
+            for i, b in bonus.items()
+            if base[i] + b >= threshold
+        }
+        # Chunks with no keyword hit still carry their base score
+        if threshold <= max(base, default=0):
+            for i, b in enumerate(base):
+                if b >= threshold and i not in bonus:
+                    scores[i] = b
+        return scores
+
+
+def active_categories(constraint_output: Dict[str, Any]) -> set:
+    """
+    Categories with at least one foundational or triggered rule.
+    (The lexical scorer only depends on these; see retrieval_key.)
+    """
+    # active rules (you can later include conditional too if you want)
+    active_rules = (
+        constraint_output.get("foundational", [])
+        + constraint_output.get("triggered", [])
+    )
+    return {r.get("category") for r in active_rules if r.get("category")}
+
+
+def retrieval_key(
+    constraint_output: Dict[str, Any],
+    sections: List[Dict[str, Any]],
+    scorer: Optional[str] = None,
+) -> tuple:
+    """
+    Everything retrieve_for_sections reads from the constraint output, as a
+    hashable key: equal keys -> identical results. The lexical scorer only
+    looks at which categories are active; BM25 also puts the active rules'
+    text into each section's query, so their ids are part of the key.
+    """
+    scorer = scorer or RETRIEVAL_SCORER
+    active = active_categories(constraint_output)
+    if scorer != "bm25":
+        return (scorer, tuple(section["category"] in active for section in sections))
+
+    rule_ids: Dict[str, List[str]] = {}
+    for group in ("foundational", "triggered"):
+        for rule in constraint_output.get(group, []):
+            rule_ids.setdefault(rule.get("category"), []).append(rule.get("id") or "")
+    return (scorer, tuple(
+        (section["category"] in active, tuple(sorted(rule_ids.get(section["category"], []))))
+        for section in sections
+    ))
+
+
 def retrieve_relevant_chunks_for_section(
     constraint_output: Dict[str, Any],
     section_category: str,
@@ -102,72 +396,168 @@ def retrieve_relevant_chunks_for_section(
     top_k: int = 6,
     always_include_baseline: bool = True,
     min_score: int = 15,
+    scorer: Optional[str] = None,
 ) -> List[Dict[str, Any]]:
     """
     Section-aware retrieval:
       - Uses triggered + foundational rules for relevance
       - BUT also can pull baseline boilerplate for that section even if no rule triggered
       - Returns multiple chunks (top_k), not 1-per-category
+
+    `scorer` overrides RETRIEVAL_SCORER for this call ("lexical" | "bm25").
     """
-    kb = load_knowledge_base()
+    section = {"id": section_title, "category": section_category, "title": section_title}
+    return retrieve_for_sections(
+        constraint_output,
+        [section],
+        top_k=top_k,
+        always_include_baseline=always_include_baseline,
+        min_score=min_score,
+        scorer=scorer,
+    )[section["id"]]
+
+
+def retrieve_for_sections(
+    constraint_output: Dict[str, Any],
+    sections: List[Dict[str, Any]],
+    top_k: int = 6,
+    always_include_baseline: bool = True,
+    min_score: int = 15,
+    scorer: Optional[str] = None,
+) -> Dict[str, List[Dict[str, Any]]]:
+    """
+    Multi-section retrieval in a single pass over the KB.
 
-    # active rules (you can later include conditional too if you want)
-    active_rules = (
-        constraint_output.get("foundational", [])
-        + constraint_output.get("triggered", [])
-    )
+    `sections` are {"id", "category", "title"} dicts (e.g. main.SECTIONS).
+    Returns {section id: top_k chunks}, each list identical to what
+    retrieve_relevant_chunks_for_section returns for that section.
+    """
+    index = get_knowledge_index()
+    active = active_categories(constraint_output)
+    use_bm25 = (scorer or RETRIEVAL_SCORER) == "bm25"
 
-    # Determine which categories are "active" for this generation call
-    active_categories = {r.get("category") for r in active_rules if r.get("category")}
-    category_is_active = section_category in active_categories
+    results: Dict[str, List[Dict[str, Any]]] = {}
+    plans = []  # (section, threshold, scores)
 
-    category_keywords = CATEGORY_KEYWORDS.get(section_category, [])
-    title_keywords = SECTION_TITLE_KEYWORDS.get(section_title, [])
+    for section in sections:
+        section_category = section["category"]
+        section_title = section["title"]
 
-    scored: List[Tuple[int, Dict[str, Any]]] = []
-    seen = set()
-
-    for chunk in kb:
-        cid = stable_id(chunk)
-        if cid in seen:
-            continue
+        # Determine which categories are "active" for this generation call
+        category_is_active = section_category in active
 
         # If we're doing baseline retrieval, we allow section-matched chunks even if not active.
         # If not baseline mode, we require the category to be active.
         if (not always_include_baseline) and (not category_is_active):
+            results[section["id"]] = []
             continue
 
-        score = _score_chunk(
-            chunk=chunk,
-            category=section_category,
-            section_title=section_title,
-            category_keywords=category_keywords,
-            title_keywords=title_keywords,
-        )
+        category_keywords = CATEGORY_KEYWORDS.get(section_category, [])
+        title_keywords = SECTION_TITLE_KEYWORDS.get(section_title, [])
+
+        if use_bm25:
+            results[section["id"]] = _retrieve_bm25(
+                constraint_output, section_category, section_title,
+                category_keywords, title_keywords, top_k,
+            )
+            continue
 
         # If the category isn't active, require strong section match to include baseline boilerplate
         if not category_is_active and always_include_baseline:
             # baseline threshold higher (prevents random pull)
-            if score < (min_score + 20):
-                continue
+            threshold = min_score + 20
         else:
-            if score < min_score:
+            threshold = min_score
+
+        scores = index.score(
+            category=section_category,
+            section_title=section_title,
+            category_keywords=category_keywords,
+            title_keywords=title_keywords,
+            threshold=threshold,
+        )
+        plans.append((section, scores, [], set()))
+
+    # ---- One walk over the union of candidates, in KB order ----
+    # (KB order keeps ties in the same order as a full scan)
+    candidates = set()
+    for _, scores, _, _ in plans:
+        candidates.update(scores)
+
+    for i in sorted(candidates):
+        cid = index.ids[i]
+        for _, scores, scored, seen in plans:
+            score = scores.get(i)
+            if score is None or cid in seen:
                 continue
+            seen.add(cid)
+            scored.append((score, i))
 
-        seen.add(cid)
+    for section, _, scored, _ in plans:
+        # Sort best-first (stable), then only copy the chunks we return
+        scored.sort(key=lambda t: t[0], reverse=True)
 
-        out = dict(chunk)
-        out["_category"] = section_category
-        out["_score"] = score
+        top: List[Dict[str, Any]] = []
+        for score, i in scored[:top_k]:
+            out = dict(index.chunks[i])
+            out["_category"] = section["category"]
+            out["_score"] = score
 
-        # Fill missing section label for readability
-        if not out.get("section"):
-            out["section"] = section_title
+            # Fill missing section label for readability
+            if not out.get("section"):
+                out["section"] = section["title"]
+            top.append(out)
+        results[section["id"]] = top
 
-        scored.append((score, out))
+    return results
 
-    # Sort best-first
-    scored.sort(key=lambda t: t[0], reverse=True)
 
-    # Return top_k
-    return [c for _, c in scored[:top_k]]
+def _retrieve_bm25(
+    constraint_output: Dict[str, Any],
+    section_category: str,
+    section_title: str,
+    category_keywords: List[str],
+    title_keywords: List[str],
+    top_k: int,
+) -> List[Dict[str, Any]]:
+    """
+    BM25 variant: the query is the category + title keywords plus the text
+    of the active rules for this category, scored against every chunk in
+    one vectorized pass. BM25 scores are on a different scale, so min_score
+    does not apply; any chunk with a positive score can be returned.
+    """
+    from knowledge.bm25 import tokenize
+
+    engine = get_bm25_index()
+    index = get_knowledge_index()
+
+    query: List[str] = []
+    for kw in list(category_keywords) + list(title_keywords):
+        query.extend(tokenize(kw))
+    for group in ("foundational", "triggered"):
+        for rule in constraint_output.get(group, []):
+            if rule.get("category") == section_category:
+                query.extend(tokenize(rule.get("rule")))
+
+    # Over-fetch so duplicate chunks can be dropped and still fill top_k
+    k = top_k
+    while True:
+        best, scores = engine.top_k(query, k)
+        results: List[Dict[str, Any]] = []
+        seen = set()
+        for i, score in zip(best.tolist(), scores.tolist()):
+            cid = index.ids[i]
+            if cid in seen:
+                continue
+            seen.add(cid)
+
+            out = dict(index.chunks[i])
+            out["_category"] = section_category
+            out["_score"] = round(score, 4)
+            if not out.get("section"):
+                out["section"] = section_title
+            results.append(out)
+
+        if len(results) >= top_k or len(best) < k:
+            return results[:top_k]
+        k *= 2
@@ -2,46 +2,12 @@ from dotenv import load_dotenv
 load_dotenv()
 
 from document import create_document
-from knowledge.retrieval import retrieve_relevant_chunks_for_section
+from knowledge.retrieval import retrieve_for_sections
 from generation.payload_builder import build_generation_payload
 from generation.generate import generate_text
 import json
 from docx import Document
-
-
-# Canonical Official Rules structure
-SECTIONS = [
-    {
-        "id": "classification",
-        "title": "Agreement to Official Rules",
-        "category": "sweepstakes_classification"
-    },
-    {
-        "id": "eligibility",
-        "title": "Eligibility",
-        "category": "eligibility"
-    },
-    {
-        "id": "entry_method",
-        "title": "How to Enter",
-        "category": "entry_method"
-    },
-    {
-        "id": "prizes",
-        "title": "Prize(s)",
-        "category": "prizes"
-    },
-    {
-        "id": "winner_clearance",
-        "title": "Requirements of Potential Winners",
-        "category": "winner_clearance"
-    },
-    {
-        "id": "general_conditions",
-        "title": "General Conditions",
-        "category": "bonding_registration"
-    }
-]
+from sections import SECTIONS
 
 
 def main():
@@ -91,20 +57,21 @@ def main():
 
     generated_sections = {}
 
+    # 🔥 SECTION-AWARE RETRIEVAL (one pass over the KB for all sections)
+    snippets_by_section = retrieve_for_sections(
+        compliance_requirements,
+        SECTIONS,
+        top_k=6,                    # Tune between 4–8
+        always_include_baseline=True,
+        min_score=15
+    )
+
     for section in SECTIONS:
 
         category = section["category"]
         title = section["title"]
 
-        # 🔥 SECTION-AWARE RETRIEVAL
-        relevant_snippets = retrieve_relevant_chunks_for_section(
-            compliance_requirements,
-            section_category=category,
-            section_title=title,
-            top_k=6,                    # Tune between 4–8
-            always_include_baseline=True,
-            min_score=15
-        )
+        relevant_snippets = snippets_by_section[section["id"]]
 
         # ---- Debug Output (Very Important For Tuning) ----
         print(f"\n=== RAG FOR: {title} ({category}) ===")
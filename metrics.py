@@ -0,0 +1,233 @@
+import time
+import threading
+from contextlib import contextmanager
+from typing import Callable, Iterator
+
+# -------------------------------------------------------------------
+# Minimal in-process metrics with Prometheus text exposition.
+# (Per-process: each uvicorn worker exposes its own series.)
+# -------------------------------------------------------------------
+
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0, 120.0)
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: tuple[str, ...], values: tuple[str, ...], extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class Counter:
+    def __init__(self, name: str, documentation: str, labelnames: tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self._values: dict[tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        key = tuple(str(labels.get(n, "")) for n in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels: str) -> float:
+        key = tuple(str(labels.get(n, "")) for n in self.labelnames)
+        with self._lock:
+            return self._values.get(key, 0.0)
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, value in items:
+            lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}")
+        return lines
+
+
+class Histogram:
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: tuple[str, ...] = (),
+        buckets: tuple[float, ...] = DEFAULT_BUCKETS,
+    ):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+        # key -> [bucket counts..., sum, count]
+        self._values: dict[tuple[str, ...], list[float]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = tuple(str(labels.get(n, "")) for n in self.labelnames)
+        with self._lock:
+            series = self._values.get(key)
+            if series is None:
+                series = [0.0] * (len(self.buckets) + 2)
+                self._values[key] = series
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    @contextmanager
+    def time(self, **labels: str) -> Iterator[None]:
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            items = sorted((k, list(v)) for k, v in self._values.items())
+        for key, series in items:
+            for bound, count in zip(self.buckets, series):
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {_format_value(count)}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {_format_value(series[-2])}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {_format_value(series[-1])}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: list = []
+        self._collectors: list[Callable[[], list[str]]] = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def register_collector(self, collector: Callable[[], list[str]]) -> None:
+        """
+        `collector` returns ready-made exposition lines at scrape time
+        (used to export stats owned by other modules).
+        """
+        self._collectors.append(collector)
+
+    def render(self) -> str:
+        lines: list[str] = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        for collector in self._collectors:
+            lines.extend(collector())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+# -------------------------------------------------------------------
+# Generation pipeline metrics
+# -------------------------------------------------------------------
+STAGE_SECONDS = REGISTRY.register(Histogram(
+    "trymark_stage_duration_seconds",
+    "Wall time spent in each /generate pipeline stage.",
+    ("stage", "section"),
+))
+
+SECTION_RETRIES = REGISTRY.register(Counter(
+    "trymark_section_retries_total",
+    "Correction retries issued after a section failed enforcement.",
+    ("section",),
+))
+
+CLAUSE_APPENDS = REGISTRY.register(Counter(
+    "trymark_clause_appends_total",
+    "Mandatory clauses appended deterministically because the model omitted them.",
+    ("section", "clause"),
+))
+
+LLM_ERRORS = REGISTRY.register(Counter(
+    "trymark_llm_errors_total",
+    "Model calls that failed after retries.",
+    ("section", "kind"),
+))
+
+PROMPT_TOKENS = REGISTRY.register(Histogram(
+    "trymark_prompt_tokens",
+    "Input tokens (system + user prompt) of each section's first model call.",
+    ("section",),
+    buckets=(250, 500, 1000, 2000, 3000, 4000, 6000, 8000, 12000, 16000, 32000),
+))
+
+LLM_INPUT_TOKENS = REGISTRY.register(Counter(
+    "trymark_llm_input_tokens_total",
+    "Input tokens billed for model calls (from response usage).",
+    ("section",),
+))
+
+LLM_CACHED_INPUT_TOKENS = REGISTRY.register(Counter(
+    "trymark_llm_cached_input_tokens_total",
+    "Input tokens served from the provider's prompt cache.",
+    ("section",),
+))
+
+LLM_OUTPUT_TOKENS = REGISTRY.register(Counter(
+    "trymark_llm_output_tokens_total",
+    "Output tokens generated by model calls.",
+    ("section",),
+))
+
+RATE_LIMIT_WAIT = REGISTRY.register(Histogram(
+    "trymark_llm_rate_limit_wait_seconds",
+    "Time model calls spent queued behind the shared RPM/TPM limiter.",
+))
+
+# Label used for stages that are not tied to a single section
+DOCUMENT = "document"
+
+
+def stage_timer(stage: str, section: str = DOCUMENT):
+    return STAGE_SECONDS.time(stage=stage, section=section)
+
+
+def render_prometheus() -> str:
+    return REGISTRY.render()
+
+
+def _gauge_lines(name: str, documentation: str, values: dict[str, float], label: str) -> list[str]:
+    lines = [f"# HELP {name} {documentation}", f"# TYPE {name} gauge"]
+    for key, value in sorted(values.items()):
+        lines.append(f'{name}{{{label}="{_escape(key)}"}} {_format_value(value)}')
+    return lines
+
+
+def _cache_collector() -> list[str]:
+    # Imported lazily: metrics must stay importable without the KB/cache modules
+    from knowledge.retrieval import kb_cache_stats
+    from generation.cache import get_section_cache
+
+    lines = _gauge_lines(
+        "trymark_kb_cache_events",
+        "Knowledge-base cache loads/hits/reloads since process start.",
+        kb_cache_stats(),
+        "event",
+    )
+    cache = get_section_cache()
+    if cache is not None:
+        lines += _gauge_lines(
+            "trymark_generation_cache_events",
+            "Generated-section cache statistics since process start.",
+            cache.stats(),
+            "event",
+        )
+    return lines
+
+
+REGISTRY.register_collector(_cache_collector)
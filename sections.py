@@ -0,0 +1,36 @@
+# Canonical Official Rules structure
+#
+# Kept in its own dependency-free module so importers (the API, the job
+# worker) don't pull in the CLI and its heavy imports just for this list.
+SECTIONS = [
+    {
+        "id": "classification",
+        "title": "Agreement to Official Rules",
+        "category": "sweepstakes_classification"
+    },
+    {
+        "id": "eligibility",
+        "title": "Eligibility",
+        "category": "eligibility"
+    },
+    {
+        "id": "entry_method",
+        "title": "How to Enter",
+        "category": "entry_method"
+    },
+    {
+        "id": "prizes",
+        "title": "Prize(s)",
+        "category": "prizes"
+    },
+    {
+        "id": "winner_clearance",
+        "title": "Requirements of Potential Winners",
+        "category": "winner_clearance"
+    },
+    {
+        "id": "general_conditions",
+        "title": "General Conditions",
+        "category": "bonding_registration"
+    }
+]